@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -23,10 +25,12 @@ if FILENAME not in project_dir_content:
         f'Убедитесь, что у вас верная структура проекта.'
     )
 
+from django.core.cache import caches
 from django.utils.version import get_version
 
 assert get_version() < '3.0.0', 'Пожалуйста, используйте версию Django < 3.0.0'
 
+from core.runner import test_caches
 from yatube.settings import INSTALLED_APPS
 
 assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts']), (
@@ -37,3 +41,24 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(settings):
+    # Фоновая нарезка миниатюр не должна переживать тест и его временные файлы.
+    settings.THUMBNAIL_WORKERS = 0
+
+
+@pytest.fixture(autouse=True)
+def inline_notifications(settings):
+    # Фоновые рассылка уведомлений и раскладка лент не должны писать
+    # в базу после теста.
+    settings.NOTIFICATION_WORKERS = 0
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(settings):
+    # Рабочий кэш — общий файл хоста: тесты получают свой, пустой.
+    settings.CACHES = test_caches()
+    for alias in settings.CACHES:
+        caches[alias].clear()
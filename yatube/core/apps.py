@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import sqlite
+        connection_created.connect(sqlite.configure)
+        if 'core.metrics.MetricsMiddleware' in settings.MIDDLEWARE:
+            from . import metrics
+            metrics.install()
+            setting_changed.connect(metrics.reinstall)
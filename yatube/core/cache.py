@@ -0,0 +1,260 @@
+"""Кэш в локальном файле SQLite, общий для всех процессов хоста.
+
+LocMemCache держит свою копию в каждом воркере: попадания делятся на
+число воркеров, а память умножается на него. Здесь воркеры читают один
+файл в режиме WAL, не мешая друг другу, а запись идет в транзакциях
+BEGIN IMMEDIATE, поэтому incr и add атомарны между процессами.
+
+Объем ограничен OPTIONS['MAX_SIZE'] байт и MAX_ENTRIES записей; сверх
+них вытесняются давно не читавшиеся записи (LRU). Суммарный размер
+ведут триггеры, так что проверка границы — чтение одной строки. Время
+чтения записи обновляется не чаще раза в TOUCH_INTERVAL секунд, чтобы
+get почти всегда оставался чистым чтением.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, '
+    'accessed REAL NOT NULL, size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_total ('
+    'id INTEGER PRIMARY KEY CHECK (id = 0), '
+    'size INTEGER NOT NULL, entries INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_total VALUES (0, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN '
+    'UPDATE cache_total SET size = size + new.size, entries = entries + 1; '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN '
+    'UPDATE cache_total SET size = size - old.size, entries = entries - 1; '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache '
+    'BEGIN UPDATE cache_total SET size = size - old.size + new.size; END',
+)
+UPSERT = (
+    'INSERT INTO cache (key, value, expires, accessed, size) '
+    'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+    'value = excluded.value, expires = excluded.expires, '
+    'accessed = excluded.accessed, size = excluded.size'
+)
+# Ограничение SQLite на число параметров запроса.
+CHUNK_SIZE = 500
+# Сколько запись ждет блокировку базы, секунд.
+BUSY_TIMEOUT = 10
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = options.get('MAX_SIZE', 64 * 1024 * 1024)
+        self._touch_interval = options.get('TOUCH_INTERVAL', 60)
+        self._local = threading.local()
+
+    def _db(self):
+        """Соединение текущего потока; после fork открывается заново."""
+        if getattr(self._local, 'pid', None) != os.getpid():
+            # Записи — pickle: чужой доступ к файлу означает выполнение
+            # кода в процессе сервера.
+            os.makedirs(
+                os.path.dirname(os.path.abspath(self._path)),
+                mode=0o700, exist_ok=True,
+            )
+            db = sqlite3.connect(
+                self._path, timeout=BUSY_TIMEOUT, isolation_level=None
+            )
+            db.execute('PRAGMA journal_mode = wal')
+            # Кэш можно потерять при сбое питания, но не испортить.
+            db.execute('PRAGMA synchronous = off')
+            self._local.db, self._local.pid = db, os.getpid()
+            with self._write() as db:
+                for sql in SCHEMA:
+                    db.execute(sql)
+        return self._local.db
+
+    @contextmanager
+    def _write(self):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _row(self, key, value, timeout, now):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return (
+            key, value, self.get_backend_timeout(timeout), now,
+            len(key) + len(value),
+        )
+
+    def _touch_stale(self, db, keys):
+        """Отмечает чтение записей для LRU. Занятая база — не повод
+        задерживать get: отметка достанется следующему чтению."""
+        if not keys:
+            return
+        # Без ожидания: занятая блокировка сразу дает OperationalError.
+        db.execute('PRAGMA busy_timeout = 0')
+        try:
+            db.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                ((time.time(), key) for key in keys),
+            )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            db.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT * 1000}')
+
+    def _fetch(self, keys):
+        """{ключ: значение} живых записей и отметка чтения устаревших."""
+        db = self._db()
+        now = time.time()
+        found = {}
+        stale = []
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            rows = db.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                chunk,
+            )
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = pickle.loads(value)
+                if now - accessed > self._touch_interval:
+                    stale.append(key)
+        self._touch_stale(db, stale)
+        return found
+
+    def _cull(self, db, now):
+        """Вытесняет просроченные, затем давно не читавшиеся записи,
+        пока кэш не уложится в MAX_SIZE и MAX_ENTRIES."""
+        size, entries = db.execute(
+            'SELECT size, entries FROM cache_total'
+        ).fetchone()
+        if size <= self._max_size and entries <= self._max_entries:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        while True:
+            size, entries = db.execute(
+                'SELECT size, entries FROM cache_total'
+            ).fetchone()
+            if size <= self._max_size and entries <= self._max_entries:
+                return
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed, rowid LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),),
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._fetch(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [
+            self._row(self._key(key, version), value, timeout, now)
+            for key, value in data.items()
+        ]
+        with self._write() as db:
+            db.executemany(UPSERT, rows)
+            self._cull(db, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            row = db.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and (row[0] is None or row[0] > now):
+                return False
+            db.execute(UPSERT, self._row(key, value, timeout, now))
+            self._cull(db, now)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (made_key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?',
+                (data, len(made_key) + len(data), now, made_key),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            updated = db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount
+        return bool(updated)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._write() as db:
+            for start in range(0, len(keys), CHUNK_SIZE):
+                chunk = keys[start:start + CHUNK_SIZE]
+                db.execute(
+                    'DELETE FROM cache '
+                    f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                    chunk,
+                )
+
+    def clear(self):
+        with self._write() as db:
+            db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живет весь поток: открывать файл на каждый запрос
+        # дороже, чем держать его.
+        pass
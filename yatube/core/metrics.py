@@ -0,0 +1,307 @@
+"""Метрики запросов в общей памяти.
+
+Счетчики лежат в файле, отображенном в память (mmap), поэтому их видят
+все процессы сервера. Каждому представлению (view_name) отведен слот:
+гистограмма времени ответа, число и время SQL-запросов, время отрисовки
+шаблонов, попадания и промахи кэша. Запись слота закрыта блокировкой
+fcntl на его байты, так что запрос платит парой системных вызовов.
+"""
+import fcntl
+import mmap
+import os
+import threading
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+# Верхние границы корзин гистограммы, секунды; последняя корзина — +Inf.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Времена хранятся в микросекундах.
+FIELDS = (
+    'requests', 'latency', 'queries', 'query_time', 'render_time',
+    'cache_hits', 'cache_misses',
+)
+NAME_SIZE = 64
+COUNTERS = len(BUCKETS) + 1 + len(FIELDS)
+SLOT_SIZE = NAME_SIZE + 8 * COUNTERS
+UNRESOLVED = 'unresolved'
+MISSING = object()
+
+_local = threading.local()
+_store = None
+
+
+class Probe:
+    """Замеры одного запроса."""
+    __slots__ = (
+        'queries', 'query_time', 'render_time', 'cache_hits',
+        'cache_misses', 'rendering', 'fetching',
+    )
+
+    def __init__(self):
+        self.queries = self.cache_hits = self.cache_misses = 0
+        self.query_time = self.render_time = 0.0
+        # Вложенные вызовы (get_many через get, include) не считаются.
+        self.rendering = self.fetching = False
+
+    def execute(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += perf_counter() - start
+
+
+def current():
+    return getattr(_local, 'probe', None)
+
+
+class Store:
+    """Слоты метрик в файле path, общем для всех процессов."""
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.index = {}
+        # Файл в закрытом каталоге, без перехода по символьной ссылке и
+        # только свой: иначе чужой процесс подсунет файл, в который
+        # сервер будет писать.
+        os.makedirs(
+            os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True
+        )
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        if os.fstat(self.fd).st_uid != os.getuid():
+            os.close(self.fd)
+            raise PermissionError(f'Файл метрик {path} принадлежит другому '
+                                  'пользователю')
+        size = slots * SLOT_SIZE
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        self.counters = memoryview(self.map).cast('q')
+
+    def name(self, slot):
+        offset = slot * SLOT_SIZE
+        return bytes(self.map[offset:offset + NAME_SIZE]).rstrip(b'\0')
+
+    def slot(self, view_name):
+        """Номер слота представления; None, если слоты кончились."""
+        slot = self.index.get(view_name)
+        if slot is not None:
+            return slot
+        name = view_name.encode()[:NAME_SIZE]
+        with self.lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+            try:
+                for slot in range(self.slots):
+                    taken = self.name(slot)
+                    if not taken:
+                        offset = slot * SLOT_SIZE
+                        self.map[offset:offset + len(name)] = name
+                    if not taken or taken == name:
+                        self.index[view_name] = slot
+                        return slot
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        return None
+
+    def record(self, view_name, latency, probe):
+        slot = self.slot(view_name)
+        if slot is None:
+            return
+        bucket = len(BUCKETS)
+        for number, bound in enumerate(BUCKETS):
+            if latency <= bound:
+                bucket = number
+                break
+        base = (slot * SLOT_SIZE + NAME_SIZE) // 8
+        fields = base + len(BUCKETS) + 1
+        counters = self.counters
+        with self.lock:
+            fcntl.lockf(
+                self.fd, fcntl.LOCK_EX, SLOT_SIZE, slot * SLOT_SIZE
+            )
+            try:
+                counters[base + bucket] += 1
+                counters[fields] += 1
+                counters[fields + 1] += int(latency * 1e6)
+                counters[fields + 2] += probe.queries
+                counters[fields + 3] += int(probe.query_time * 1e6)
+                counters[fields + 4] += int(probe.render_time * 1e6)
+                counters[fields + 5] += probe.cache_hits
+                counters[fields + 6] += probe.cache_misses
+            finally:
+                fcntl.lockf(
+                    self.fd, fcntl.LOCK_UN, SLOT_SIZE, slot * SLOT_SIZE
+                )
+
+    def snapshot(self):
+        """{view_name: (корзины, {поле: значение})} по занятым слотам."""
+        result = {}
+        for slot in range(self.slots):
+            name = self.name(slot)
+            if not name:
+                break
+            base = (slot * SLOT_SIZE + NAME_SIZE) // 8
+            values = self.counters[base:base + COUNTERS].tolist()
+            result[name.decode(errors='replace')] = (
+                values[:len(BUCKETS) + 1],
+                dict(zip(FIELDS, values[len(BUCKETS) + 1:])),
+            )
+        return result
+
+
+def store():
+    global _store
+    if _store is None or _store.path != settings.METRICS_FILE:
+        _store = Store(settings.METRICS_FILE, settings.METRICS_SLOTS)
+    return _store
+
+
+class MetricsMiddleware:
+    """Замеряет запрос и пишет итог в слот его представления."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        probe = _local.probe = Probe()
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(probe.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.probe = None
+        match = request.resolver_match
+        store().record(
+            match.view_name if match else UNRESOLVED,
+            perf_counter() - start,
+            probe,
+        )
+        return response
+
+
+def timed_render(render):
+    def wrapper(self, context=None, request=None):
+        probe = current()
+        if probe is None or probe.rendering:
+            return render(self, context, request)
+        probe.rendering = True
+        start = perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            probe.render_time += perf_counter() - start
+            probe.rendering = False
+    wrapper.metrics = True
+    return wrapper
+
+
+def counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        probe = current()
+        if probe is None or probe.fetching:
+            return get(self, key, default, version)
+        probe.fetching = True
+        try:
+            value = get(self, key, MISSING, version)
+        finally:
+            probe.fetching = False
+        if value is MISSING:
+            probe.cache_misses += 1
+            return default
+        probe.cache_hits += 1
+        return value
+    wrapper.metrics = True
+    return wrapper
+
+
+def counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        probe = current()
+        if probe is None or probe.fetching:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        probe.fetching = True
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            probe.fetching = False
+        probe.cache_hits += len(found)
+        probe.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.metrics = True
+    return wrapper
+
+
+def install():
+    """Подключает замер отрисовки шаблонов и обращений к кэшам."""
+    from django.template.backends.django import Template
+
+    if not getattr(Template.render, 'metrics', False):
+        Template.render = timed_render(Template.render)
+    for params in settings.CACHES.values():
+        backend = import_string(params['BACKEND'])
+        if not getattr(backend.get, 'metrics', False):
+            backend.get = counted_get(backend.get)
+        if not getattr(backend.get_many, 'metrics', False):
+            backend.get_many = counted_get_many(backend.get_many)
+
+
+def reinstall(setting, **kwargs):
+    """Подменили CACHES (например, в тестах) — замеряем и новые бэкенды."""
+    if setting == 'CACHES':
+        install()
+
+
+def export():
+    """Метрики в текстовом формате Prometheus."""
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP yatube_{name} {help_text}')
+        lines.append(f'# TYPE yatube_{name} {kind}')
+
+    snapshot = store().snapshot()
+    family(
+        'request_duration_seconds', 'histogram', 'Время ответа представления.'
+    )
+    for view, (buckets, fields) in snapshot.items():
+        total = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), buckets):
+            total += count
+            lines.append(
+                'yatube_request_duration_seconds_bucket'
+                f'{{view="{view}",le="{bound}"}} {total}'
+            )
+        lines.append(
+            f'yatube_request_duration_seconds_sum{{view="{view}"}} '
+            f'{fields["latency"] / 1e6}'
+        )
+        lines.append(
+            f'yatube_request_duration_seconds_count{{view="{view}"}} '
+            f'{fields["requests"]}'
+        )
+    counters = (
+        ('db_queries_total', 'queries', 1, 'Число SQL-запросов.'),
+        ('db_query_seconds_total', 'query_time', 1e6, 'Время SQL-запросов.'),
+        ('template_render_seconds_total', 'render_time', 1e6,
+         'Время отрисовки шаблонов.'),
+        ('cache_hits_total', 'cache_hits', 1, 'Попадания в кэш.'),
+        ('cache_misses_total', 'cache_misses', 1, 'Промахи кэша.'),
+    )
+    for name, field, scale, help_text in counters:
+        family(name, 'counter', help_text)
+        for view, (buckets, fields) in snapshot.items():
+            value = fields[field] / scale if scale != 1 else fields[field]
+            lines.append(f'yatube_{name}{{view="{view}"}} {value}')
+    return '\n'.join(lines) + '\n'
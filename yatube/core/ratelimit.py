@@ -0,0 +1,89 @@
+"""Ограничение частоты запросов к записывающим страницам.
+
+Скользящее окно считается по двум соседним фиксированным окнам: запросы
+текущего окна плюс запросы предыдущего с весом той его части, что еще
+попадает в последние window секунд. Счетчики лежат в кэше и растут
+атомарным incr, поэтому все воркеры делят один лимит. Пользователь
+определяется по id из сессии, без запроса к auth_user, так что отказ
+429 отдается до любой работы с моделями.
+
+Лимиты задаются в settings.RATE_LIMITS:
+{область: {'user': (запросов, секунд), 'ip': (запросов, секунд)}}.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+
+def client_ip(request):
+    """Адрес клиента из заголовка settings.RATE_LIMIT_IP_HEADER: за
+    обратным прокси это, например, HTTP_X_REAL_IP."""
+    return request.META.get(settings.RATE_LIMIT_IP_HEADER, '')
+
+
+def hit(key, window, now):
+    """Учитывает запрос. Возвращает число запросов за последние
+    window секунд."""
+    slot = int(now // window)
+    current = f'ratelimit:{key}:{slot}'
+    cache.add(current, 0, window * 2)
+    try:
+        count = cache.incr(current)
+    except ValueError:
+        # Счетчик вытеснили между add и incr.
+        cache.set(current, 1, window * 2)
+        count = 1
+    previous = cache.get(f'ratelimit:{key}:{slot - 1}', 0)
+    return count + previous * (1 - (now / window - slot))
+
+
+def retry_after(request, scope):
+    """Через сколько секунд клиенту можно повторить запрос; None, если
+    лимит не превышен."""
+    limits = settings.RATE_LIMITS.get(scope)
+    if not limits:
+        return None
+    clients = []
+    session = getattr(request, 'session', None)
+    user_id = session.get(SESSION_KEY) if session is not None else None
+    if user_id is not None and 'user' in limits:
+        clients.append(('user', user_id))
+    if 'ip' in limits:
+        clients.append(('ip', client_ip(request)))
+    now = time.time()
+    for kind, client in clients:
+        limit, window = limits[kind]
+        if hit(f'{scope}:{kind}:{client}', window, now) > limit:
+            return math.ceil(window - now % window)
+    return None
+
+
+def too_many_requests(seconds):
+    response = HttpResponse(
+        render_to_string('core/429.html', {'retry_after': seconds}),
+        status=429,
+    )
+    response['Retry-After'] = str(seconds)
+    return response
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Ограничивает запросы methods к представлению лимитами области
+    scope. Ставится над login_required, чтобы отказ не читал
+    пользователя."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                seconds = retry_after(request, scope)
+                if seconds is not None:
+                    return too_many_requests(seconds)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
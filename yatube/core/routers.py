@@ -0,0 +1,72 @@
+"""Чтение с реплик, запись в основную базу.
+
+Чтение расходится по псевдонимам из settings.REPLICA_DATABASES, запись
+и миграции идут в default. Реплика отстает, поэтому после записи клиент
+получает cookie и на REPLICA_PIN_SECONDS читает из основной базы: так
+автор сразу видит свой пост, комментарий или подписку.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_pin'
+
+_state = threading.local()
+
+
+def pinned():
+    return getattr(_state, 'pinned', False)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if (
+            not replicas
+            or pinned()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Дальше в этом запросе читаем свою же запись.
+        _state.pinned = _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными.
+        return db not in settings.REPLICA_DATABASES
+
+
+class PrimaryPinMiddleware:
+    """Закрепляет за клиентом основную базу после его записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.pinned = PIN_COOKIE in request.COOKIES
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            _state.pinned = _state.wrote = False
+        if wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,31 @@
+"""Запуск тестов с собственным кэшем.
+
+Рабочий кэш — общий файл хоста (core.cache): тесты не должны ни читать
+из него, ни очищать его под работающим сервером. На время прогона все
+алиасы CACHES подменяются на LocMemCache этого процесса.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def test_caches():
+    return {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'test-{alias}',
+        }
+        for alias in settings.CACHES
+    }
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES=test_caches())
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
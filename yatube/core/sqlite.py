@@ -0,0 +1,21 @@
+"""Производственный профиль SQLite.
+
+Прагмы из settings.SQLITE_PRAGMAS применяются к каждому новому
+соединению: WAL разрешает читать во время записи, synchronous=NORMAL
+в режиме WAL не теряет целостность, mmap_size и cache_size уменьшают
+число системных вызовов, а busy_timeout заставляет писателя подождать
+блокировку вместо ошибки "database is locked".
+"""
+from django.conf import settings
+
+
+def apply(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply(cursor, settings.SQLITE_PRAGMAS)
@@ -0,0 +1,64 @@
+"""Хранилище статики для collectstatic: имена с хэшем содержимого и
+сжатые заранее копии.
+
+Шаблоны получают хэшированное имя из манифеста staticfiles.json, поэтому
+файлы можно отдавать с бессрочным кэшированием (Cache-Control: immutable):
+новая версия файла получает новое имя. Рядом с каждым текстовым файлом
+лежат .gz и, если установлен brotli, .br — веб-сервер отдает их без
+сжатия на лету (gzip_static / brotli_static).
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (
+    '.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico',
+)
+# Сжатая копия нужна, только если заметно меньше исходного файла.
+MIN_RATIO = 0.95
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(hashed):
+            if name.endswith(COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(content) * MIN_RATIO:
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+
+    def stored_name(self, name):
+        # До collectstatic (разработка, тесты) манифеста нет: отдаем
+        # исходное имя вместо ошибки при отрисовке шаблона. С манифестом
+        # неизвестный файл — ошибка сборки, ее не прячем.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if self.hashed_files or self.exists(self.manifest_name):
+                raise
+            return name
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+
+INCREMENTS = 50
+PROCESSES = 4
+
+
+def cache_at(path, **options):
+    return SQLiteCache(path, {'OPTIONS': options})
+
+
+def increment(path):
+    cache = cache_at(path)
+    for _ in range(INCREMENTS):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite3')
+        self.cache = cache_at(self.path)
+
+    def test_private_directory(self):
+        """Каталог кэша создается доступным только владельцу."""
+        directory = os.path.join(tempfile.mkdtemp(), 'cache')
+        cache_at(os.path.join(directory, 'cache.sqlite3')).set('a', 1)
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+
+    def test_get_set_many(self):
+        """Значения переживают pickle, пакетные операции и сроки."""
+        self.cache.set_many({'a': 1, 'b': [2], 'c': None})
+        self.cache.set('gone', 1, timeout=0)
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c', 'gone', 'missing']),
+            {'a': 1, 'b': [2], 'c': None},
+        )
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+        self.assertFalse(self.cache.add('a', 2))
+        self.assertTrue(self.cache.add('gone', 2))
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'gone']), {'gone': 2})
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_shared_between_processes(self):
+        """incr атомарен между процессами, данные видны всем."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.path,))
+            for _ in range(PROCESSES)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), INCREMENTS * PROCESSES)
+        self.assertEqual(
+            cache_at(self.path).get('counter'), INCREMENTS * PROCESSES
+        )
+
+    def test_get_does_not_wait_for_writer(self):
+        """Отметка чтения не ждет чужую запись: get отвечает сразу."""
+        cache = cache_at(self.path, TOUCH_INTERVAL=0)
+        cache.set('a', 1)
+        writer = sqlite3.connect(self.path, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            start = time.monotonic()
+            self.assertEqual(cache.get('a'), 1)
+            self.assertLess(time.monotonic() - start, 1)
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+        cache.set('b', 2)
+
+    def test_lru_eviction(self):
+        """Сверх MAX_ENTRIES и MAX_SIZE вытесняются давно не читавшиеся
+        записи."""
+        cache = cache_at(
+            self.path, MAX_ENTRIES=3, CULL_FREQUENCY=3, TOUCH_INTERVAL=0
+        )
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        cache.get('a')
+        cache.set('d', 4)
+        self.assertEqual(set(cache.get_many('abcd')), {'a', 'c', 'd'})
+        cache = cache_at(self.path, MAX_SIZE=1000)
+        cache.set('big', 'x' * 800)
+        cache.set('bigger', 'x' * 800)
+        self.assertEqual(set(cache.get_many(['big', 'bigger'])), {'bigger'})
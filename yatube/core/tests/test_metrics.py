@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from posts.models import User
+
+from ..metrics import FIELDS, Store, store
+
+METRICS = reverse('metrics')
+INDEX = reverse('posts:index')
+EMPTY = dict.fromkeys(FIELDS, 0)
+METRICS_FILE = os.path.join(tempfile.mkdtemp(), 'metrics')
+
+
+@override_settings(METRICS_FILE=METRICS_FILE)
+class MetricsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = Client()
+        cls.admin.force_login(
+            User.objects.create_user(username='admin', is_staff=True)
+        )
+        cls.user = Client()
+        cls.user.force_login(User.objects.create_user(username='user'))
+
+    def test_metrics_recorded_per_view(self):
+        """Запросы попадают в слот своего представления: гистограмма,
+        SQL, шаблоны и кэш."""
+        cache.clear()
+        before = store().snapshot().get('posts:index', ([0], EMPTY))[1]
+        for _ in range(3):
+            self.client.get(INDEX)
+        buckets, fields = store().snapshot()['posts:index']
+        self.assertEqual(sum(buckets), fields['requests'])
+        self.assertEqual(fields['requests'] - before['requests'], 3)
+        for field in ('queries', 'render_time', 'cache_hits', 'cache_misses'):
+            with self.subTest(field=field):
+                self.assertGreater(fields[field], before[field])
+
+    def test_store_refuses_symlink(self):
+        """Хранилище не пишет через символьную ссылку."""
+        directory = tempfile.mkdtemp()
+        target = os.path.join(directory, 'target')
+        open(target, 'w').close()
+        link = os.path.join(directory, 'metrics')
+        os.symlink(target, link)
+        with self.assertRaises(OSError):
+            Store(link, 1)
+        self.assertEqual(os.path.getsize(target), 0)
+
+    def test_metrics_endpoint_admin_only(self):
+        """Метрики в формате Prometheus видит только персонал."""
+        self.client.get(INDEX)
+        response = self.admin.get(METRICS)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, 'yatube_request_duration_seconds_count'
+            '{view="posts:index"}'
+        )
+        self.assertContains(response, 'le="+Inf"')
+        for client in (self.client, self.user):
+            with self.subTest(client=client):
+                self.assertEqual(client.get(METRICS).status_code, 302)
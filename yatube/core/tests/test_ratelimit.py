@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+from ..ratelimit import hit
+
+SIGNUP = reverse('users:signup')
+TOO_MANY_REQUESTS = 429
+
+
+@override_settings(RATE_LIMITS={
+    'add_comment': {'user': (2, 60), 'ip': (3, 60)},
+    'signup': {'ip': (1, 60 * 60)},
+})
+class RateLimitTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=author, text='Пост')
+        cls.ADD_COMMENT = reverse('posts:add_comment', args=[cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, username):
+        client = Client()
+        client.force_login(User.objects.create_user(username=username))
+        return client
+
+    def comment(self, client):
+        return client.post(self.ADD_COMMENT, {'text': 'Комментарий'})
+
+    def test_sliding_window(self):
+        """Запросы прошлого окна учитываются с весом его непрошедшей
+        доли."""
+        for _ in range(4):
+            hit('test', 10, 105.0)
+        self.assertEqual(hit('test', 10, 112.5), 1 + 4 * 0.75)
+        self.assertEqual(hit('test', 10, 125.0), 1 + 1 * 0.5)
+
+    def test_user_and_ip_limits(self):
+        """Сверх лимита пользователя или адреса запрос получает 429 без
+        чтения пользователя и постов."""
+        first = self.client_for('first')
+        for _ in range(2):
+            self.assertEqual(self.comment(first).status_code, 302)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.comment(first)
+        self.assertEqual(response.status_code, TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertFalse(any(
+            'auth_user' in query['sql'] or 'posts_' in query['sql']
+            for query in queries
+        ))
+        second = self.client_for('second')
+        self.assertEqual(self.comment(second).status_code, 302)
+        self.assertEqual(self.comment(second).status_code, TOO_MANY_REQUESTS)
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_signup_limited_by_ip(self):
+        """Регистрации с одного адреса ограничены."""
+        data = {
+            'username': 'new_user',
+            'password1': 'Sup3r-secret!',
+            'password2': 'Sup3r-secret!',
+        }
+        self.assertEqual(self.client.post(SIGNUP, data).status_code, 302)
+        data['username'] = 'another_user'
+        self.assertEqual(
+            self.client.post(SIGNUP, data).status_code, TOO_MANY_REQUESTS
+        )
+        self.assertFalse(User.objects.filter(username='another_user'))
@@ -0,0 +1,71 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..routers import PIN_COOKIE
+
+TEST_NAME = 'test_name'
+PROFILE = reverse('posts:profile', args=[TEST_NAME])
+POST_CREATE = reverse('posts:post_create')
+REPLICA = 'replica'
+
+
+@override_settings(
+    REPLICA_DATABASES=[REPLICA], THUMBNAIL_WORKERS=0, NOTIFICATION_WORKERS=0
+)
+class ReplicaRouterTest(TransactionTestCase):
+    """Основная база — тестовая default, реплика — отдельный файл SQLite,
+    который догоняет основную по команде replicate()."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(self.directory, 'replica.sqlite3'),
+        }
+        self.user = User.objects.create_user(username=TEST_NAME)
+        Post.objects.create(author=self.user, text='Первый пост')
+        self.author = Client()
+        self.author.force_login(self.user)
+        self.replicate()
+
+    def tearDown(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def replicate(self):
+        connections[REPLICA].close()
+        primary = connections['default']
+        primary.ensure_connection()
+        replica = sqlite3.connect(connections.databases[REPLICA]['NAME'])
+        primary.connection.backup(replica)
+        replica.close()
+
+    def posts_on_profile(self, client):
+        return len(client.get(PROFILE).context['page_obj'])
+
+    def test_reads_go_to_replica(self):
+        """Без записи чтение идет с отстающей реплики."""
+        Post.objects.create(author=self.user, text='Второй пост')
+        self.assertEqual(self.posts_on_profile(self.client), 1)
+        self.assertEqual(self.posts_on_profile(self.author), 1)
+        self.replicate()
+        self.assertEqual(self.posts_on_profile(self.client), 2)
+
+    def test_writer_pinned_to_primary(self):
+        """Автор сразу после записи видит свой пост, остальные читают
+        реплику, пока та не догонит основную базу."""
+        response = self.author.post(POST_CREATE, {'text': 'Второй пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.posts_on_profile(self.author), 2)
+        self.assertEqual(self.posts_on_profile(self.client), 1)
+        self.assertNotIn(PIN_COOKIE, self.client.get(PROFILE).cookies)
@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from ..sqlite import apply
+
+
+class SqlitePragmasTest(TestCase):
+
+    def test_connection_configured(self):
+        """Новое соединение Django получает прагмы профиля."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_file_database_in_wal_mode(self):
+        """Файловая база переходит в режим WAL."""
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'db.sqlite3'))
+            apply(db.cursor(), settings.SQLITE_PRAGMAS)
+            mode = db.execute('PRAGMA journal_mode').fetchone()[0]
+            db.close()
+        self.assertEqual(mode, 'wal')
+
+    def test_benchmark_sqlite(self):
+        """Нагрузочный замер сравнивает оба профиля."""
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite', writers=2, readers=2, seconds=0.2, stdout=out
+        )
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
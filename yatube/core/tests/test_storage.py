@@ -0,0 +1,43 @@
+import gzip
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+
+CSS = 'css/bootstrap.min.css'
+
+
+class CompressedManifestStorageTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        settings = override_settings(STATIC_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_collectstatic(self):
+        """collectstatic пишет имена с хэшем, сжатые копии и манифест,
+        по которому шаблоны получают хэшированные имена."""
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as manifest:
+            hashed = json.load(manifest)['paths'][CSS]
+        self.assertNotEqual(hashed, CSS)
+        with open(os.path.join(self.root, hashed), 'rb') as original:
+            content = original.read()
+        with gzip.open(os.path.join(self.root, hashed + '.gz')) as packed:
+            self.assertEqual(packed.read(), content)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'img/cat.jpeg.gz')
+        ))
+        self.assertEqual(static(CSS), '/static/' + hashed)
+        with self.assertRaises(ValueError):
+            static('css/missing.css')
+
+    def test_without_manifest(self):
+        """До collectstatic шаблоны получают исходные имена."""
+        self.assertEqual(static(CSS), '/static/' + CSS)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from .fulltext import filter_matching, match_expression
 from .models import Group, Post, Comment, Follow
 
 
@@ -28,6 +29,13 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE '%q%'."""
+        match = match_expression(search_term)
+        if match is None:
+            return queryset, False
+        return filter_matching(queryset, match), False
+
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,51 @@
+"""Кэш главной страницы, который сбрасывается событиями, а не временем.
+
+Ключи страниц содержат номер поколения. Любое изменение, которое видно
+на главной (новый, измененный или удаленный пост, изменение группы),
+увеличивает поколение, и все страницы начинают строиться заново.
+Отдельные страницы (?page=N, ?cursor=...) кэшируются под своими URL.
+"""
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.views.decorators.cache import cache_page
+
+GENERATION_KEY = 'index_page:generation'
+
+
+def index_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Начальное значение из часов: после очистки кэша поколение
+        # не совпадет с поколением уже лежащих в кэше страниц.
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate_index():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        index_generation()
+
+
+def invalidate_index_on_commit():
+    """Увеличивает поколение после фиксации транзакции. Иначе запрос,
+    пришедший до фиксации, закэширует старые строки под новым
+    поколением."""
+    transaction.on_commit(invalidate_index)
+
+
+def cache_index(view):
+    """Как cache_page, но с текущим поколением в префиксе ключа."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return cache_page(
+            settings.INDEX_CACHE_TIMEOUT,
+            key_prefix=f'index_page:{index_generation()}',
+        )(view)(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,64 @@
+"""Кэш отрисованных карточек постов (posts/includes/post_card.html).
+
+Ключ карточки содержит версию — отпечаток всех полей поста, группы и
+автора, которые выводятся в карточке. Сохранение любой из этих записей
+с новыми данными меняет версию, и старая карточка больше не читается.
+"""
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+
+TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_version(post, flags):
+    group = post.group
+    author = post.author
+    fingerprint = (
+        settings.POST_CARD_VERSION,
+        post.text,
+        post.pub_date.isoformat(),
+        post.image.name,
+        group and (group.id, group.slug, group.title),
+        author.username,
+        author.first_name,
+        author.last_name,
+        sorted(flags.items()),
+    )
+    return md5(repr(fingerprint).encode()).hexdigest()
+
+
+def attach_cards(posts, **flags):
+    """Кладет в post.card HTML карточки каждого поста страницы.
+    Кэш читается одним get_many, недостающие карточки пишутся
+    одним set_many. Карточки рисуются только с готовыми миниатюрами."""
+    keys = {
+        f'post_card:{post.id}:{card_version(post, flags)}': post
+        for post in posts
+    }
+    cards = cache.get_many(keys)
+    images = thumbnails.variants(
+        [post.image for key, post in keys.items() if key not in cards]
+    )
+    missing = {}
+    for key, post in keys.items():
+        card = cards.get(key)
+        if card is None:
+            image = images.get(post.image.name)
+            card = render_to_string(TEMPLATE, {
+                'post': post,
+                'image': image,
+                **flags,
+            })
+            # Карточку с заглушкой не кэшируем: миниатюра скоро будет.
+            if image or not post.image:
+                missing[key] = card
+        post.card = mark_safe(card)
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return posts
@@ -0,0 +1,91 @@
+"""Ежедневная рассылка: новые посты избранных авторов одним письмом.
+
+Пользователи читаются потоком пакетами по BATCH_SIZE. Посты для всего
+пакета берутся одним запросом из материализованной ленты подписок
+(TimelineItem) по индексу (user, pub_date), а письма пакета уходят через
+одно соединение с почтовым сервером вызовом send_messages.
+"""
+from itertools import groupby
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .models import TimelineItem, User
+from .utils import batched
+
+BATCH_SIZE = 500
+SUBJECT = 'Новые посты избранных авторов'
+TEMPLATE = 'posts/email/digest.txt'
+
+
+def recipients(batch_size=BATCH_SIZE):
+    """Пакеты [(id, username, email)] пользователей с адресом почты."""
+    users = (
+        User.objects
+        .filter(is_active=True)
+        .exclude(email='')
+        .order_by('id')
+        .values_list('id', 'username', 'email')
+        .iterator(chunk_size=batch_size)
+    )
+    return batched(users, batch_size)
+
+
+def posts_for(user_ids, since):
+    """{id пользователя: [посты]} за период одним запросом на пакет."""
+    items = (
+        TimelineItem.objects
+        .filter(user_id__in=user_ids, pub_date__gte=since)
+        .select_related('post__author', 'post__group')
+        .order_by('user_id', '-pub_date', '-post_id')
+    )
+    return {
+        user_id: [item.post for item in user_items][
+            :settings.DIGEST_POSTS
+        ]
+        for user_id, user_items in groupby(
+            items, key=lambda item: item.user_id
+        )
+    }
+
+
+def message(username, email, posts, connection):
+    body = render_to_string(TEMPLATE, {
+        'username': username,
+        'posts': [
+            (post, settings.SITE_URL + reverse(
+                'posts:post_detail', args=[post.id]
+            ))
+            for post in posts
+        ],
+    })
+    return EmailMessage(SUBJECT, body, to=[email], connection=connection)
+
+
+def send(since, batch_size=BATCH_SIZE):
+    """Рассылает письма всем, у кого в ленте есть посты новее since.
+    Возвращает число отправленных писем."""
+    if not settings.SITE_URL:
+        raise ImproperlyConfigured(
+            'Не задан SITE_URL (YATUBE_SITE_URL): ссылкам в письмах '
+            'нужен адрес сайта.'
+        )
+    sent = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        for batch in recipients(batch_size):
+            posts = posts_for([user_id for user_id, *_ in batch], since)
+            messages = [
+                message(username, email, posts[user_id], connection)
+                for user_id, username, email in batch
+                if user_id in posts
+            ]
+            if messages:
+                sent += connection.send_messages(messages) or 0
+    finally:
+        connection.close()
+    return sent
@@ -0,0 +1,194 @@
+"""Ленты RSS 2.0, Atom и JSON Feed для всего сайта, группы и автора.
+
+Ответ отдается потоком. ETag и Last-Modified берутся из даты последнего
+поста ленты, поэтому на If-None-Match/If-Modified-Since отвечаем 304
+после одного индексного запроса, без выборки постов и без отрисовки.
+"""
+import json
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from .models import Group, Post, User
+
+
+def item(request, post):
+    return {
+        'url': request.build_absolute_uri(
+            reverse('posts:post_detail', args=[post.id])
+        ),
+        'title': Truncator(post.text).chars(50),
+        'text': post.text,
+        'author': post.author.get_full_name() or post.author.username,
+        'pub_date': post.pub_date,
+    }
+
+
+def rss(request, channel, posts):
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+        f'<title>{escape(channel["title"])}</title>'
+        f'<link>{escape(channel["link"])}</link>'
+        f'<description>{escape(channel["description"])}</description>'
+        '<language>ru</language>'
+    )
+    for post in posts:
+        entry = item(request, post)
+        yield (
+            '<item>'
+            f'<title>{escape(entry["title"])}</title>'
+            f'<link>{escape(entry["url"])}</link>'
+            f'<guid>{escape(entry["url"])}</guid>'
+            f'<description>{escape(entry["text"])}</description>'
+            f'<dc:creator>{escape(entry["author"])}</dc:creator>'
+            f'<pubDate>{rfc2822_date(entry["pub_date"])}</pubDate>'
+            '</item>'
+        )
+    yield '</channel></rss>'
+
+
+def atom(request, channel, posts):
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ru">'
+        f'<title>{escape(channel["title"])}</title>'
+        f'<link href="{escape(channel["link"])}" rel="alternate"/>'
+        f'<id>{escape(channel["link"])}</id>'
+        f'<subtitle>{escape(channel["description"])}</subtitle>'
+        f'<updated>{rfc3339_date(channel["updated"])}</updated>'
+    )
+    for post in posts:
+        entry = item(request, post)
+        yield (
+            '<entry>'
+            f'<title>{escape(entry["title"])}</title>'
+            f'<link href="{escape(entry["url"])}" rel="alternate"/>'
+            f'<id>{escape(entry["url"])}</id>'
+            f'<author><name>{escape(entry["author"])}</name></author>'
+            f'<updated>{rfc3339_date(entry["pub_date"])}</updated>'
+            f'<content type="text">{escape(entry["text"])}</content>'
+            '</entry>'
+        )
+    yield '</feed>'
+
+
+def json_feed(request, channel, posts):
+    header = json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': channel['title'],
+        'home_page_url': channel['link'],
+        'feed_url': request.build_absolute_uri(),
+        'description': channel['description'],
+        'language': 'ru',
+    }, ensure_ascii=False)
+    yield header[:-1] + ', "items": ['
+    for number, post in enumerate(posts):
+        entry = item(request, post)
+        yield (', ' if number else '') + json.dumps({
+            'id': entry['url'],
+            'url': entry['url'],
+            'title': entry['title'],
+            'content_text': entry['text'],
+            'date_published': entry['pub_date'].isoformat(),
+            'authors': [{'name': entry['author']}],
+        }, ensure_ascii=False)
+    yield ']}'
+
+
+WRITERS = {
+    'rss': ('application/rss+xml; charset=utf-8', rss),
+    'atom': ('application/atom+xml; charset=utf-8', atom),
+    'json': ('application/feed+json; charset=utf-8', json_feed),
+}
+
+
+def feed_view(posts_for, channel_for):
+    """Потоковое представление ленты с условным GET по дате
+    последнего поста."""
+    def latest(request, fmt, **kwargs):
+        if not hasattr(request, 'feed_latest'):
+            request.feed_latest = (
+                posts_for(**kwargs)
+                .values_list('pub_date', flat=True)
+                .first()
+            )
+        return request.feed_latest
+
+    def etag(request, fmt, **kwargs):
+        pub_date = latest(request, fmt, **kwargs)
+        return pub_date and f'{request.path}{pub_date.timestamp()}'
+
+    @condition(etag_func=etag, last_modified_func=latest)
+    def view(request, fmt, **kwargs):
+        if fmt not in WRITERS:
+            raise Http404
+        content_type, writer = WRITERS[fmt]
+        channel = channel_for(request, **kwargs)
+        # У пустой ленты нет даты последнего поста, а Atom требует
+        # <updated>: берем текущее время.
+        channel.setdefault(
+            'updated', latest(request, fmt, **kwargs) or timezone.now()
+        )
+        posts = (
+            posts_for(**kwargs)
+            .select_related('author')[:settings.FEED_ITEMS]
+            .iterator()
+        )
+        return StreamingHttpResponse(
+            writer(request, channel, posts),
+            content_type=content_type,
+        )
+    return view
+
+
+def site_channel(request):
+    return {
+        'title': 'Yatube',
+        'link': request.build_absolute_uri(reverse('posts:index')),
+        'description': 'Последние обновления на сайте',
+    }
+
+
+def group_channel(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return {
+        'title': group.title,
+        'link': request.build_absolute_uri(
+            reverse('posts:group_list', args=[slug])
+        ),
+        'description': group.description,
+    }
+
+
+def author_channel(request, username):
+    author = get_object_or_404(User, username=username)
+    return {
+        'title': author.get_full_name() or author.username,
+        'link': request.build_absolute_uri(
+            reverse('posts:profile', args=[username])
+        ),
+        'description': f'Посты пользователя {author.username}',
+    }
+
+
+site_feed = feed_view(
+    lambda: Post.objects.all(),
+    site_channel,
+)
+group_feed = feed_view(
+    lambda slug: Post.objects.filter(group__slug=slug),
+    group_channel,
+)
+profile_feed = feed_view(
+    lambda username: Post.objects.filter(author__username=username),
+    author_channel,
+)
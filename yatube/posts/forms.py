@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 
 from .models import Post, Comment
 
@@ -8,6 +9,41 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Обрезанную загрузку не отдаем Pillow: ошибка будет о размере.
+        self.image_too_large = getattr(
+            self.files.get('image'), 'truncated', False
+        )
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        """Формат и размер в пикселях берутся из заголовка картинки,
+        прочитанного ImageField; пиксели не декодируются."""
+        image = self.cleaned_data['image']
+        if self.image_too_large:
+            raise forms.ValidationError(
+                'Файл больше %(size)d МБ.',
+                params={'size': settings.UPLOAD_MAX_SIZE // 2 ** 20},
+            )
+        header = getattr(image, 'image', None)
+        if header is None:
+            return image
+        if header.format not in settings.POST_IMAGE_UPLOAD_FORMATS:
+            raise forms.ValidationError(
+                'Формат %(format)s не поддерживается.',
+                params={'format': header.format},
+            )
+        width, height = header.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                'Картинка больше %(pixels)d мегапикселей.',
+                params={'pixels': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+            )
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,79 @@
+"""Полнотекстовый поиск по Post.text на SQLite FTS5.
+
+Индекс posts_post_fts создается миграцией 0019 и обновляется триггерами.
+Результаты ранжируются по bm25 и листаются курсором (bm25, id), поэтому
+следующая страница не пересчитывает предыдущие.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Post
+
+TERM = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Запрос FTS5 из пользовательского ввода: каждое слово берется
+    в кавычки, чтобы операторы FTS5 не ломали разбор запроса."""
+    return ' '.join(f'"{term}"' for term in TERM.findall(query)) or None
+
+
+def filter_matching(queryset, match):
+    """Оставляет в выборке постов только подходящие под запрос FTS5."""
+    return queryset.extra(
+        where=['posts_post.id IN (SELECT rowid FROM posts_post_fts '
+               'WHERE posts_post_fts MATCH %s)'],
+        params=[match],
+    )
+
+
+def encode_cursor(rank, post_id):
+    return urlsafe_base64_encode(force_bytes(f'{rank!r}|{post_id}'))
+
+
+def decode_cursor(cursor):
+    try:
+        rank, post_id = urlsafe_base64_decode(cursor).decode().split('|')
+        return float(rank), int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def search(query, cursor=None, limit=None):
+    """Посты по запросу в порядке релевантности и курсор следующей
+    страницы (None, если страница последняя)."""
+    match = match_expression(query)
+    if match is None:
+        return [], None
+    limit = limit or settings.POSTS_PER_PAGE
+    sql = (
+        'SELECT rowid, bm25(posts_post_fts) FROM posts_post_fts '
+        'WHERE posts_post_fts MATCH %s'
+    )
+    params = [match]
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        sql += (
+            ' AND (bm25(posts_post_fts) > %s'
+            ' OR (bm25(posts_post_fts) = %s AND rowid > %s))'
+        )
+        params += [position[0], position[0], position[1]]
+    sql += ' ORDER BY bm25(posts_post_fts), rowid LIMIT %s'
+    params.append(limit + 1)
+    with connection.cursor() as db:
+        db.execute(sql, params)
+        rows = db.fetchall()
+    found = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for post_id, _ in rows[:limit]]
+    )
+    posts = [found[post_id] for post_id, _ in rows[:limit]
+             if post_id in found]
+    next_cursor = (
+        encode_cursor(rows[limit - 1][1], rows[limit - 1][0])
+        if len(rows) > limit else None
+    )
+    return posts, next_cursor
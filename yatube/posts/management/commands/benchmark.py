@@ -0,0 +1,206 @@
+import json
+import math
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Follow, Notification, Post, UserStats
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет все представления posts/urls.py через тестовый клиент: '
+        'p50/p95/p99 времени ответа и число SQL-запросов. Завершается '
+        'ошибкой, если результат хуже сохраненной базовой линии. Запросы '
+        'идут вне транзакции, как в работе сервера; подписка читателя на '
+        'автора и его непрочитанные уведомления восстанавливаются перед '
+        'каждым запросом и после замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--baseline', default=settings.BENCHMARK_BASELINE,
+            help='JSON-файл базовой линии.',
+        )
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Сохранить результаты как новую базовую линию.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый относительный рост p95.',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+
+    def samples(self):
+        """Значения параметров маршрутов: самый плодовитый автор, его
+        последний пост, группа самого свежего поста, самый подписанный
+        читатель."""
+        author_id = (
+            UserStats.objects.order_by('-posts_count')
+            .values_list('user_id', flat=True).first()
+        )
+        reader_id = (
+            UserStats.objects.order_by('-following_count')
+            .values_list('user_id', flat=True).first()
+        )
+        post = (
+            Post.objects.filter(author_id=author_id)
+            .select_related('author').first()
+        )
+        slug = (
+            Post.objects.filter(group__isnull=False)
+            .values_list('group__slug', flat=True).first()
+        )
+        if post is None or slug is None or reader_id is None:
+            raise CommandError(
+                'Нет данных для замеров: сначала выполните seed_data.'
+            )
+        values = {
+            'username': post.author.username,
+            'post_id': post.id,
+            'slug': slug,
+            'fmt': 'rss',
+        }
+        return values, reader_id, post.author_id
+
+    def preparations(self, reader_id, author_id):
+        """Действия перед запросом к меняющим данные представлениям:
+        каждый замер проходит тот же путь, что и первый."""
+        follow = {'user_id': reader_id, 'author_id': author_id}
+        unread = list(
+            Notification.objects.filter(user_id=reader_id, read=False)
+            .values_list('id', flat=True)
+        )
+
+        def unfollow():
+            Follow.objects.filter(**follow).delete()
+
+        def refollow():
+            Follow.objects.get_or_create(**follow)
+
+        def unread_again():
+            Notification.objects.filter(id__in=unread).update(read=False)
+
+        following = Follow.objects.filter(**follow).exists()
+        restore = (refollow if following else unfollow, unread_again)
+        return {
+            f'{urls.app_name}:profile_follow': unfollow,
+            f'{urls.app_name}:profile_unfollow': refollow,
+            f'{urls.app_name}:notification_index': unread_again,
+        }, restore
+
+    def measure(self, client, url, repeat, cold, prepare=None):
+        timings = []
+        queries = 0
+        for _ in range(repeat + 1):
+            if prepare is not None:
+                prepare()
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    # Ленты строятся при чтении ответа.
+                    b''.join(response.streaming_content)
+                elapsed = perf_counter() - start
+            timings.append(elapsed)
+            queries = max(queries, len(captured))
+        # Первый запрос — прогрев.
+        timings = timings[1:]
+        return {
+            'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95),
+            'p99': percentile(timings, 99),
+            'queries': queries,
+        }
+
+    def regressions(self, results, baseline, tolerance):
+        for view, result in results.items():
+            base = baseline.get(view)
+            if base is None:
+                continue
+            if result['p95'] > base['p95'] * (1 + tolerance):
+                yield (
+                    f'{view}: p95 {result["p95"] * 1000:.1f} мс против '
+                    f'{base["p95"] * 1000:.1f} мс'
+                )
+            if result['queries'] > base['queries']:
+                yield (
+                    f'{view}: {result["queries"]} запросов против '
+                    f'{base["queries"]}'
+                )
+
+    def handle(self, *args, **options):
+        values, reader_id, author_id = self.samples()
+        preparations, restore = self.preparations(reader_id, author_id)
+        client = Client()
+        client.force_login(UserStats.objects.get(user_id=reader_id).user)
+        results = {}
+        self.stdout.write(
+            f'{"представление":<24}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"p99, мс":>10}{"запросы":>10}'
+        )
+        # Замеряется работа представлений, а не отказы ограничителя.
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            RATE_LIMITS={},
+        ):
+            try:
+                for pattern in urls.urlpatterns:
+                    view = f'{urls.app_name}:{pattern.name}'
+                    url = reverse(view, kwargs={
+                        name: values[name]
+                        for name in pattern.pattern.converters
+                    })
+                    result = self.measure(
+                        client, url, options['repeat'], options['cold'],
+                        preparations.get(view),
+                    )
+                    results[view] = result
+                    self.stdout.write(
+                        f'{view:<24}{result["p50"] * 1000:>10.1f}'
+                        f'{result["p95"] * 1000:>10.1f}'
+                        f'{result["p99"] * 1000:>10.1f}'
+                        f'{result["queries"]:>10}'
+                    )
+            finally:
+                for action in restore:
+                    action()
+        if options['save']:
+            with open(options['baseline'], 'w') as baseline:
+                json.dump(results, baseline, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS('Базовая линия сохранена'))
+            return
+        try:
+            with open(options['baseline']) as baseline:
+                baseline = json.load(baseline)
+        except FileNotFoundError:
+            self.stdout.write('Базовой линии нет, сравнение пропущено')
+            return
+        regressions = list(
+            self.regressions(results, baseline, options['tolerance'])
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессия производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
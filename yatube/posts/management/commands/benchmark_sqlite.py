@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from time import perf_counter, sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import apply
+
+from .benchmark import percentile
+
+SCHEMA = (
+    'CREATE TABLE comment ('
+    'id INTEGER PRIMARY KEY, post_id INTEGER, text TEXT, created REAL)'
+)
+INSERT = 'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)'
+SELECT = (
+    'SELECT id, text FROM comment WHERE post_id = ? ORDER BY id DESC LIMIT 20'
+)
+INDEX = 'CREATE INDEX comment_post_idx ON comment (post_id, id)'
+POSTS = 100
+_lock = threading.Lock()
+
+
+def connect(path, pragmas):
+    # Как у Django: таймаут модуля sqlite3 по умолчанию, 5 секунд.
+    db = sqlite3.connect(path, isolation_level=None)
+    apply(db.cursor(), pragmas)
+    return db
+
+
+def write(path, pragmas, stop, stats):
+    """Пишет комментарии по одному в автокоммите, пока не остановят."""
+    db = connect(path, pragmas)
+    done = locked = 0
+    while not stop.is_set():
+        try:
+            db.execute(INSERT, (done % POSTS, 'текст ' * 20, perf_counter()))
+            done += 1
+        except sqlite3.OperationalError:
+            locked += 1
+    db.close()
+    with _lock:
+        stats['writes'] += done
+        stats['locked'] += locked
+
+
+def read(path, pragmas, stop, stats):
+    """Читает страницы комментариев, замеряя каждый запрос."""
+    db = connect(path, pragmas)
+    latencies = []
+    locked = 0
+    while not stop.is_set():
+        start = perf_counter()
+        try:
+            db.execute(SELECT, (len(latencies) % POSTS,)).fetchall()
+        except sqlite3.OperationalError:
+            locked += 1
+            continue
+        latencies.append(perf_counter() - start)
+    db.close()
+    with _lock:
+        stats['latencies'].extend(latencies)
+        stats['locked'] += locked
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность записи и задержку чтения '
+        'SQLite без прагм и с профилем settings.SQLITE_PRAGMAS при '
+        'параллельных писателях и читателях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def run(self, path, pragmas, writers, readers, seconds):
+        stop = threading.Event()
+        stats = {'writes': 0, 'locked': 0, 'latencies': []}
+        db = connect(path, pragmas)
+        db.execute(SCHEMA)
+        db.execute(INDEX)
+        db.close()
+        threads = [
+            threading.Thread(target=write, args=(path, pragmas, stop, stats))
+            for _ in range(writers)
+        ] + [
+            threading.Thread(target=read, args=(path, pragmas, stop, stats))
+            for _ in range(readers)
+        ]
+        for thread in threads:
+            thread.start()
+        sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        latencies = stats['latencies'] or [0]
+        return {
+            'writes': stats['writes'] / seconds,
+            'locked': stats['locked'],
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+        }
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"профиль":<10}{"записей/с":>12}{"ошибок":>8}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}'
+        )
+        profiles = (('без прагм', {}), ('прагмы', settings.SQLITE_PRAGMAS))
+        with tempfile.TemporaryDirectory() as directory:
+            for number, (name, pragmas) in enumerate(profiles):
+                result = self.run(
+                    os.path.join(directory, f'{number}.sqlite3'),
+                    pragmas,
+                    options['writers'],
+                    options['readers'],
+                    options['seconds'],
+                )
+                self.stdout.write(
+                    f'{name:<10}{result["writes"]:>12.0f}'
+                    f'{result["locked"]:>8}'
+                    f'{result["p50"] * 1000:>10.2f}'
+                    f'{result["p95"] * 1000:>10.2f}'
+                    f'{result["p99"] * 1000:>10.2f}'
+                )
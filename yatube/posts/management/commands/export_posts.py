@@ -0,0 +1,27 @@
+import gzip
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в JSONL '
+        '(файл .gz сжимается).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-', help='Файл выгрузки, - для stdout.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['output']
+        if path == '-':
+            total = transfer.dump(self.stdout)
+        else:
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'wt', encoding='utf-8') as stream:
+                total = transfer.dump(stream)
+        self.stderr.write(f'Выгружено записей: {total}')
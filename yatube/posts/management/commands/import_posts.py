@@ -0,0 +1,40 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии и подписки из JSONL, '
+        'выгруженного командой export_posts. Каждый пакет фиксируется '
+        'отдельно: при ошибке загруженные пакеты остаются, а повторный '
+        'запуск с тем же файлом пропустит их и закончит загрузку.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки, - для stdin.')
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            if path == '-':
+                loaded = transfer.load(sys.stdin, options['batch_size'])
+            else:
+                opener = gzip.open if path.endswith('.gz') else open
+                with opener(path, 'rt', encoding='utf-8') as stream:
+                    loaded = transfer.load(stream, options['batch_size'])
+        except (KeyError, ValueError) as error:
+            raise CommandError(f'Некорректная запись: {error!r}')
+        except IntegrityError as error:
+            # Откатился только текущий пакет.
+            raise CommandError(f'Несогласованная выгрузка: {error}')
+        for kind, total in loaded.items():
+            self.stdout.write(f'{kind}: {total}')
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
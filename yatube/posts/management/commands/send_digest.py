@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import digest
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассылает пользователям письмо с новыми постами избранных авторов '
+        'за последние сутки. Запускается раз в день планировщиком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=24, help='Период дайджеста, часов.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=digest.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        sent = digest.send(since, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Отправлено писем: {sent}'))
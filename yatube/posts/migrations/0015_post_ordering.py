@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:03
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_auto_20221018_1453'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'пост', 'verbose_name_plural': 'посты'},
+        ),
+    ]
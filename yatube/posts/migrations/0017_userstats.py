@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    def per_user(model, field):
+        return dict(
+            model.objects.order_by().values_list(field).annotate(Count('pk'))
+        )
+
+    posts = per_user(Post, 'author')
+    comments = per_user(Comment, 'author')
+    followers = per_user(Follow, 'author')
+    following = per_user(Follow, 'user')
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=user_id,
+                posts_count=posts.get(user_id, 0),
+                comments_count=comments.get(user_id, 0),
+                followers_count=followers.get(user_id, 0),
+                following_count=following.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list('id', flat=True)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_timelineitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+                ('posts_count', models.IntegerField(default=0, verbose_name='постов')),
+                ('comments_count', models.IntegerField(default=0, verbose_name='комментариев')),
+                ('followers_count', models.IntegerField(default=0, verbose_name='подписчиков')),
+                ('following_count', models.IntegerField(default=0, verbose_name='подписок')),
+            ],
+            options={
+                'verbose_name': 'статистика пользователя',
+                'verbose_name_plural': 'статистика пользователей',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:40
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def fill_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    posts = dict(
+        Post.objects.order_by().values_list('group').annotate(Count('pk'))
+    )
+    latest = dict(
+        Post.objects.order_by().values_list('group').annotate(Max('pub_date'))
+    )
+    GroupStats.objects.bulk_create(
+        (
+            GroupStats(
+                group_id=group_id,
+                posts_count=posts.get(group_id, 0),
+                latest_post=latest.get(group_id),
+            )
+            for group_id in Group.objects.values_list('id', flat=True)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group', verbose_name='группа')),
+                ('posts_count', models.IntegerField(default=0, verbose_name='постов')),
+                ('latest_post', models.DateTimeField(null=True, verbose_name='последний пост')),
+            ],
+            options={
+                'verbose_name': 'статистика группы',
+                'verbose_name_plural': 'статистика групп',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
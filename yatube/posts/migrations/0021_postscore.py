@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-18 13:05
+
+import math
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def fill_scores(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    PostScore = apps.get_model('posts', 'PostScore')
+    scale = math.log(2) / settings.TRENDING_HALF_LIFE
+
+    def score(rows):
+        weights = [created.timestamp() * scale for _, created in rows]
+        top = max(weights)
+        return top + math.log(sum(math.exp(x - top) for x in weights))
+
+    comments = Comment.objects.order_by('post_id').values_list(
+        'post_id', 'created'
+    )
+    PostScore.objects.bulk_create(
+        (
+            PostScore(post_id=post_id, score=score(rows))
+            for post_id, rows in groupby(comments.iterator(), itemgetter(0))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_groupstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post', verbose_name='пост')),
+                ('score', models.FloatField(verbose_name='рейтинг')),
+            ],
+            options={
+                'verbose_name': 'рейтинг поста',
+                'verbose_name_plural': 'рейтинги постов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['-score'], name='post_score_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
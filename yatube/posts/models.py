@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import DEFERRED
 
 User = get_user_model()
 
@@ -51,11 +52,27 @@ class Post(models.Model):
     class Meta:
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Группа на момент загрузки: по ней сигнал сохранения замечает
+        # перенос поста в другую группу.
+        post._loaded_group_id = post.__dict__.get('group_id', DEFERRED)
+        return post
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -80,6 +97,10 @@ class Comment(models.Model):
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
         ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['post', '-created'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -109,3 +130,148 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user.username}-{self.author.username}'
+
+
+class TimelineItem(models.Model):
+    """Запись материализованной ленты подписок: пост автора,
+    разложенный подписчику в момент публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='подписчик',
+        related_name='timeline',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='автор',
+        related_name='+',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='пост',
+        related_name='timeline_items',
+    )
+    pub_date = models.DateTimeField(verbose_name='дата публикации')
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'лента подписок'
+        ordering = ('-pub_date', '-post_id')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_item')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}-{self.post_id}'
+
+
+class UserStats(models.Model):
+    """Счетчики профиля, которые обновляются при каждом изменении,
+    чтобы страницы профиля и поста не выполняли COUNT-запросов."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='пользователь',
+        related_name='stats',
+    )
+    posts_count = models.IntegerField('постов', default=0)
+    comments_count = models.IntegerField('комментариев', default=0)
+    followers_count = models.IntegerField('подписчиков', default=0)
+    following_count = models.IntegerField('подписок', default=0)
+
+    class Meta:
+        verbose_name = 'статистика пользователя'
+        verbose_name_plural = 'статистика пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}'
+
+
+class GroupStats(models.Model):
+    """Число постов группы и время последнего из них: обновляются при
+    публикации, переносе и удалении поста, чтобы каталог групп и лента
+    группы не агрегировали посты на каждый запрос."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='группа',
+        related_name='stats',
+    )
+    posts_count = models.IntegerField('постов', default=0)
+    latest_post = models.DateTimeField('последний пост', null=True)
+
+    class Meta:
+        verbose_name = 'статистика группы'
+        verbose_name_plural = 'статистика групп'
+
+    def __str__(self):
+        return f'{self.group_id}'
+
+
+class PostScore(models.Model):
+    """Рейтинг поста для вкладки «Популярное», см. posts.trending."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='пост',
+        related_name='score',
+    )
+    score = models.FloatField('рейтинг')
+
+    class Meta:
+        verbose_name = 'рейтинг поста'
+        verbose_name_plural = 'рейтинги постов'
+        indexes = [
+            models.Index(fields=['-score'], name='post_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}'
+
+
+class Notification(models.Model):
+    """Уведомление подписчику о новом посте автора."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='получатель',
+        related_name='notifications',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='пост',
+        related_name='notifications',
+    )
+    pub_date = models.DateTimeField(verbose_name='дата публикации')
+    read = models.BooleanField('прочитано', default=False)
+
+    class Meta:
+        verbose_name = 'уведомление'
+        verbose_name_plural = 'уведомления'
+        ordering = ('-pub_date', '-id')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_notification')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-id'],
+                         name='notification_user_idx'),
+            models.Index(fields=['user', 'read'],
+                         name='notification_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}-{self.post_id}'
@@ -0,0 +1,190 @@
+"""Уведомления подписчикам о новых постах.
+
+Публикация не ждет рассылки: после фиксации транзакции пост уходит
+в фоновый поток, который идет по подписчикам автора пакетами по
+BATCH_SIZE и вставляет уведомления одним bulk_create на пакет. Каждый
+пакет фиксируется отдельно, так что запись в SQLite не держит
+блокировку дольше одного пакета. Повторная рассылка того же поста
+ничего не дублирует. Один рабочий поток (NOTIFICATION_WORKERS) не дает
+рассылкам разных авторов соперничать за запись.
+
+Число непрочитанных лежит в кэше по пользователю под ключом с версией:
+рассылка меняет версию у получивших уведомление, чтение уменьшает
+счетчик. Счетчик, посчитанный до рассылки, ложится под старую версию
+и больше не читается. Значок вставляет
+BadgeMiddleware в уже готовый ответ, поэтому закэшированные целиком
+страницы (главная) не хранят чужое или устаревшее число.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.html import format_html
+
+from .models import Follow, Notification
+from .utils import batched
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Место значка в шаблоне; см. BadgeMiddleware.
+BADGE_MARKER = b'<!-- notifications-badge -->'
+
+_lock = threading.Lock()
+_executor = None
+
+
+def deliver(post_id, author_id, pub_date):
+    """Раскладывает уведомления о посте всем подписчикам автора.
+    Возвращает число подписчиков."""
+    followers = (
+        Follow.objects
+        .filter(author_id=author_id)
+        .order_by('user_id')
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    total = 0
+    for batch in batched(followers, BATCH_SIZE):
+        Notification.objects.bulk_create(
+            (
+                Notification(user_id=user_id, post_id=post_id,
+                             pub_date=pub_date)
+                for user_id in batch
+            ),
+            ignore_conflicts=True,
+        )
+        version = time.time_ns()
+        cache.set_many(
+            {version_key(user_id): version for user_id in batch}, None
+        )
+        total += len(batch)
+    return total
+
+
+def _work(post_id, author_id, pub_date):
+    try:
+        deliver(post_id, author_id, pub_date)
+    except Exception:
+        logger.exception('Не удалось разослать уведомления о посте %s',
+                         post_id)
+    finally:
+        connection.close()
+
+
+def executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.NOTIFICATION_WORKERS,
+                thread_name_prefix='notifications',
+            )
+    return _executor
+
+
+def schedule(post):
+    """Ставит рассылку в очередь. Без пула (NOTIFICATION_WORKERS = 0)
+    уведомления пишутся сразу."""
+    args = (post.id, post.author_id, post.pub_date)
+    if not settings.NOTIFICATION_WORKERS:
+        deliver(*args)
+        return
+    executor().submit(_work, *args)
+
+
+def schedule_on_commit(post):
+    """Ставит рассылку в очередь после фиксации поста: фоновый поток
+    читает базу своим соединением и должен видеть пост."""
+    transaction.on_commit(lambda: schedule(post))
+
+
+def version_key(user_id):
+    return f'notifications:version:{user_id}'
+
+
+def counter_key(user_id):
+    """Ключ счетчика непрочитанных для текущей версии."""
+    version = cache.get(version_key(user_id), 0)
+    return f'notifications:unread:{user_id}:{version}'
+
+
+def unread(user_id):
+    """Число непрочитанных уведомлений, но не больше
+    NOTIFICATION_BADGE_LIMIT + 1: значку хватит «99+». Считается в базе
+    только после рассылки; остальные страницы берут его из кэша."""
+    key = counter_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(
+            user_id=user_id, read=False
+        ).order_by()[:settings.NOTIFICATION_BADGE_LIMIT + 1].count()
+        cache.add(key, count, settings.NOTIFICATION_COUNTER_TIMEOUT)
+    return count
+
+
+def badge(user_id):
+    """Текст значка непрочитанных: '', '7' или '99+'."""
+    count = unread(user_id)
+    if count > settings.NOTIFICATION_BADGE_LIMIT:
+        return f'{settings.NOTIFICATION_BADGE_LIMIT}+'
+    return str(count) if count else ''
+
+
+def mark_read(user, notifications):
+    """Отмечает прочитанными показанные уведомления и уменьшает
+    счетчик непрочитанных."""
+    updated = Notification.objects.filter(
+        user=user,
+        read=False,
+        id__in=[notification.id for notification in notifications],
+    ).update(read=True)
+    if not updated:
+        return
+    key = counter_key(user.id)
+    count = cache.get(key)
+    if count is None:
+        return
+    if count > settings.NOTIFICATION_BADGE_LIMIT:
+        # Счетчик обрезан сверху, разность неточна: посчитаем заново.
+        cache.delete(key)
+        return
+    try:
+        cache.decr(key, min(updated, count))
+    except ValueError:
+        # Счетчик истек или вытеснен между get и decr.
+        pass
+
+
+class BadgeMiddleware:
+    """Подставляет значок непрочитанных на место BADGE_MARKER. Номер
+    пользователя берется из сессии, без запроса к auth_user."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or not response.get('Content-Type', '').startswith('text/html')
+            or BADGE_MARKER not in response.content
+        ):
+            return response
+        session = getattr(request, 'session', None)
+        user_id = session.get(SESSION_KEY) if session is not None else None
+        text = badge(user_id) if user_id is not None else ''
+        html = format_html(
+            '<span class="badge rounded-pill bg-danger">{}</span>', text
+        ) if text else ''
+        response.content = response.content.replace(
+            BADGE_MARKER, html.encode(), 1
+        )
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        return response
@@ -0,0 +1,173 @@
+"""Синтетические данные для нагрузочных замеров.
+
+Пользователи, группы, посты, комментарии и подписки пишутся пакетной
+вставкой. Популярность авторов подчиняется степенному закону: немногие
+пишут большую часть постов и собирают большинство подписчиков, как в
+настоящей соцсети. Тексты берутся из заранее созданного Faker набора,
+чтобы не генерировать их для каждой строки.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from . import stats, timeline, trending
+from .models import Comment, Follow, Group, Post, User
+from .utils import batched
+
+BATCH_SIZE = 5000
+TEXTS = 1000
+PERIOD = timedelta(days=365)
+# Доля постов без группы.
+NO_GROUP = 0.3
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволяет задать даты полей auto_now_add на время загрузки."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def last_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def insert(model, rows, batch_size):
+    """Вставляет поток строк пакетами; возвращает диапазон новых id.
+    Автоинкремент без параллельных писателей выдает их подряд."""
+    first = last_id(model) + 1
+    for batch in batched(rows, batch_size):
+        model.objects.bulk_create(batch)
+    return range(first, last_id(model) + 1)
+
+
+class Seeder:
+    def __init__(self, seed=None, alpha=1.1, batch_size=BATCH_SIZE):
+        self.random = random.Random(seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.texts = [self.faker.text(200) for _ in range(TEXTS)]
+        self.now = timezone.now()
+
+    def popular(self, ids):
+        """Накопленные веса для выбора id со степенным распределением:
+        вес k-го по популярности равен 1 / k ** alpha."""
+        return list(accumulate(
+            1 / rank ** self.alpha for rank in range(1, len(ids) + 1)
+        ))
+
+    def date(self):
+        return self.now - self.random.random() * PERIOD
+
+    def text(self):
+        return self.random.choice(self.texts)
+
+    def users(self, count):
+        password = make_password(None)
+        return insert(User, (
+            User(
+                username=f'{self.faker.user_name()}_{number}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+            )
+            for number in range(last_id(User), last_id(User) + count)
+        ), self.batch_size)
+
+    def groups(self, count):
+        return insert(Group, (
+            Group(
+                title=self.faker.catch_phrase()[:200],
+                slug=f'{self.faker.slug()}-{number}'[:50],
+                description=self.text(),
+            )
+            for number in range(last_id(Group), last_id(Group) + count)
+        ), self.batch_size)
+
+    def posts(self, count, users, groups):
+        authors = self.popular(users)
+        rows = (
+            Post(
+                text=self.text(),
+                author_id=self.random.choices(users, cum_weights=authors)[0],
+                group_id=(
+                    self.random.choice(groups)
+                    if groups and self.random.random() > NO_GROUP else None
+                ),
+                pub_date=self.date(),
+            )
+            for _ in range(count)
+        )
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            return insert(Post, rows, self.batch_size)
+
+    def comments(self, count, users, posts):
+        if not posts:
+            return range(0)
+        rows = (
+            Comment(
+                text=self.text(),
+                author_id=self.random.choice(users),
+                post_id=self.random.choice(posts),
+                created=self.date(),
+            )
+            for _ in range(count)
+        )
+        with explicit_dates(Comment._meta.get_field('created')):
+            return insert(Comment, rows, self.batch_size)
+
+    def follows(self, average, users):
+        """Каждый подписывается в среднем на average авторов, выбирая
+        их по популярности; число подписчиков распределено степенно."""
+        authors = self.popular(users)
+
+        def rows():
+            for user_id in users:
+                chosen = set(self.random.choices(
+                    users,
+                    cum_weights=authors,
+                    k=self.random.randint(0, 2 * average),
+                ))
+                chosen.discard(user_id)
+                for author_id in chosen:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        total = 0
+        for batch in batched(rows(), self.batch_size):
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        return total
+
+
+def seed(users, groups, posts, comments, follows, seed=None,
+         alpha=1.1, batch_size=BATCH_SIZE):
+    """Создает данные и пересчитывает ленты подписок, счетчики и рейтинги
+    популярного, которые пакетная вставка обходит. Возвращает число
+    строк по видам."""
+    seeder = Seeder(seed, alpha, batch_size)
+    user_ids = seeder.users(users)
+    group_ids = seeder.groups(groups)
+    post_ids = seeder.posts(posts, user_ids, group_ids)
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': len(post_ids),
+        'comments': len(seeder.comments(comments, user_ids, post_ids)),
+        'follows': seeder.follows(follows, user_ids),
+        'timeline': timeline.rebuild(),
+        'stats': stats.rebuild(),
+        'trending': trending.rebuild(),
+    }
@@ -0,0 +1,79 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import notifications, stats, timeline, trending
+from .caching import invalidate_index_on_commit
+from .models import Comment, Follow, Group, GroupStats, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    invalidate_index_on_commit()
+    if raw:
+        return
+    if created:
+        stats.bump(instance.author_id, 'posts_count', 1)
+        stats.add_to_group(instance.group_id, instance.pub_date)
+        timeline.schedule_on_commit(instance)
+        notifications.schedule_on_commit(instance)
+    else:
+        previous = getattr(instance, '_loaded_group_id', DEFERRED)
+        if previous is DEFERRED or previous == instance.group_id:
+            return
+        stats.remove_from_group(previous)
+        stats.add_to_group(instance.group_id, instance.pub_date)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_index_on_commit()
+    stats.bump(instance.author_id, 'posts_count', -1)
+    stats.remove_from_group(instance.group_id)
+
+
+@receiver(post_save, sender=Group)
+def group_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        GroupStats.objects.create(group=instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    invalidate_index_on_commit()
+    stats.invalidate_directory()
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, 'comments_count', 1)
+        trending.record(instance.post_id, instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, 'followers_count', 1)
+        stats.bump(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, 'followers_count', -1)
+    stats.bump(instance.user_id, 'following_count', -1)
+    timeline.clean_up(instance.user_id, instance.author_id)
@@ -0,0 +1,176 @@
+"""Счетчики профиля (UserStats) и группы (GroupStats): обновляются
+атомарно при каждом изменении и пересчитываются пакетно командой
+reconcile_stats."""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DateTimeField, F, Max, OuterRef, Q, Subquery, Value, When,
+)
+
+from .models import Comment, Follow, Group, GroupStats, Post, User, UserStats
+from .utils import batched
+
+BATCH_SIZE = 1000
+DIRECTORY_KEY = 'group_directory'
+
+
+def bump(user_id, field, delta):
+    """Меняет счетчик одним UPDATE, не читая текущее значение."""
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta}
+    )
+
+
+def count(user_id):
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'comments_count': Comment.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def stats_for(user):
+    """Счетчики пользователя. Недостающая запись создается один раз."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.update_or_create(
+            user_id=user.id,
+            defaults=count(user.id),
+        )
+        return stats
+
+
+def per_user(model, field):
+    """{значение field: число записей} одним GROUP BY."""
+    return dict(
+        model.objects.order_by().values_list(field).annotate(Count('pk'))
+    )
+
+
+def rebuild():
+    """Пересчитывает счетчики всех пользователей четырьмя GROUP BY
+    и пакетной вставкой, затем счетчики групп. Возвращает число
+    пользователей."""
+    posts = per_user(Post, 'author')
+    comments = per_user(Comment, 'author')
+    followers = per_user(Follow, 'author')
+    following = per_user(Follow, 'user')
+    total = 0
+    with transaction.atomic():
+        UserStats.objects.all().delete()
+        user_ids = User.objects.values_list('id', flat=True).iterator()
+        for batch in batched(user_ids, BATCH_SIZE):
+            UserStats.objects.bulk_create(
+                UserStats(
+                    user_id=user_id,
+                    posts_count=posts.get(user_id, 0),
+                    comments_count=comments.get(user_id, 0),
+                    followers_count=followers.get(user_id, 0),
+                    following_count=following.get(user_id, 0),
+                )
+                for user_id in batch
+            )
+            total += len(batch)
+    rebuild_groups()
+    return total
+
+
+def add_to_group(group_id, pub_date):
+    """Пост появился в группе: счетчик растет, время последнего поста
+    сдвигается вперед, если пост новее."""
+    if group_id is None:
+        return
+    pub_date = Value(pub_date, output_field=DateTimeField())
+    GroupStats.objects.filter(group_id=group_id).update(
+        posts_count=F('posts_count') + 1,
+        latest_post=Case(
+            When(
+                Q(latest_post__isnull=True) | Q(latest_post__lt=pub_date),
+                then=pub_date,
+            ),
+            default=F('latest_post'),
+        ),
+    )
+    invalidate_directory()
+
+
+def remove_from_group(group_id):
+    """Пост ушел из группы: счетчик уменьшается, время последнего поста
+    перечитывается по индексу (group, -pub_date)."""
+    if group_id is None:
+        return
+    GroupStats.objects.filter(group_id=group_id).update(
+        posts_count=F('posts_count') - 1,
+        latest_post=Subquery(
+            Post.objects.filter(group_id=OuterRef('group_id'))
+            .order_by('-pub_date', '-id')
+            .values('pub_date')[:1]
+        ),
+    )
+    invalidate_directory()
+
+
+def count_group(group_id):
+    return Post.objects.filter(group_id=group_id).aggregate(
+        posts_count=Count('pk'), latest_post=Max('pub_date')
+    )
+
+
+def group_stats_for(group):
+    """Счетчики группы. Недостающая запись создается один раз."""
+    try:
+        return group.stats
+    except GroupStats.DoesNotExist:
+        stats, _ = GroupStats.objects.update_or_create(
+            group_id=group.id,
+            defaults=count_group(group.id),
+        )
+        return stats
+
+
+def rebuild_groups():
+    """Пересчитывает счетчики всех групп двумя GROUP BY."""
+    posts = per_user(Post, 'group')
+    latest = dict(
+        Post.objects.order_by().values_list('group').annotate(Max('pub_date'))
+    )
+    with transaction.atomic():
+        GroupStats.objects.all().delete()
+        GroupStats.objects.bulk_create(
+            (
+                GroupStats(
+                    group_id=group_id,
+                    posts_count=posts.get(group_id, 0),
+                    latest_post=latest.get(group_id),
+                )
+                for group_id in Group.objects.values_list('id', flat=True)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    invalidate_directory()
+
+
+def group_directory():
+    """Каталог групп из кэша: название, число постов и время последнего
+    поста. Сбрасывается изменениями групп и их постов."""
+    groups = cache.get(DIRECTORY_KEY)
+    if groups is None:
+        groups = list(
+            Group.objects.order_by('title').values(
+                'slug',
+                'title',
+                posts_count=F('stats__posts_count'),
+                latest_post=F('stats__latest_post'),
+            )
+        )
+        cache.set(DIRECTORY_KEY, groups, settings.GROUP_DIRECTORY_TIMEOUT)
+    return groups
+
+
+def invalidate_directory():
+    """Сбрасывает каталог после фиксации транзакции, чтобы запрос до
+    фиксации не закэшировал старые счетчики."""
+    transaction.on_commit(lambda: cache.delete(DIRECTORY_KEY))
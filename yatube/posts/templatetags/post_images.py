@@ -0,0 +1,13 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_variants(image):
+    """Готовые варианты картинки или None, пока они нарезаются."""
+    if not image:
+        return None
+    return thumbnails.variants([image]).get(image.name)
@@ -0,0 +1,265 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, TimelineItem, User
+from ..urls import app_name, urlpatterns
+from .utils import run_on_commit
+
+BASELINE = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class BenchmarkTest(TestCase):
+
+    def test_seed_data(self):
+        """Генератор создает заданные объемы и собирает ленты подписок."""
+        call_command(
+            'seed_data', users=20, groups=3, posts=200, comments=300,
+            follows=3, seed=1, stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertGreater(Follow.objects.count(), 0)
+        self.assertEqual(
+            TimelineItem.objects.count(),
+            sum(
+                Post.objects.filter(author_id=author_id).count()
+                for author_id in Follow.objects.values_list(
+                    'author_id', flat=True)
+            )
+        )
+        self.assertEqual(
+            Post.objects.values('pub_date').distinct().count(), 200
+        )
+
+    def test_benchmark_baseline(self):
+        """Замеры охватывают все маршруты posts, включая чтение лент,
+        не меняют подписки и падают на регрессии."""
+        call_command(
+            'seed_data', users=10, groups=2, posts=50, comments=50,
+            follows=3, seed=1, stdout=StringIO(),
+        )
+        follows = set(Follow.objects.values_list('user', 'author'))
+        call_command(
+            'benchmark', repeat=2, baseline=BASELINE, save=True,
+            stdout=StringIO(),
+        )
+        self.assertEqual(
+            set(Follow.objects.values_list('user', 'author')), follows
+        )
+        with open(BASELINE) as file:
+            baseline = json.load(file)
+        self.assertEqual(
+            set(baseline),
+            {f'{app_name}:{pattern.name}' for pattern in urlpatterns}
+        )
+        self.assertGreater(baseline[f'{app_name}:feed']['queries'], 1)
+        for result in baseline.values():
+            result['queries'] = 0
+        with open(BASELINE, 'w') as file:
+            json.dump(baseline, file)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark', repeat=2, baseline=BASELINE, stdout=StringIO()
+            )
+
+
+def content():
+    """Посты и комментарии без id: комментарий узнается по своему посту."""
+    return {
+        Post: sorted(Post.objects.values_list(
+            'author__username', 'text', 'pub_date'
+        )),
+        Comment: sorted(Comment.objects.values_list(
+            'post__author__username', 'post__pub_date', 'author__username',
+            'text', 'created'
+        )),
+    }
+
+
+def snapshot():
+    """Содержимое базы без суррогатных id пользователей и групп."""
+    return {
+        Group: sorted(Group.objects.values_list(
+            'slug', 'title', 'description'
+        )),
+        Post: sorted(Post.objects.values_list(
+            'id', 'author__username', 'group__slug', 'text', 'pub_date'
+        )),
+        Comment: sorted(Comment.objects.values_list(
+            'id', 'post_id', 'author__username', 'text', 'created'
+        )),
+        Follow: sorted(Follow.objects.values_list(
+            'user__username', 'author__username'
+        )),
+    }
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class TransferTest(TestCase):
+
+    def test_export_import_roundtrip(self):
+        """Выгрузка загружается в пустую базу без потерь, ленты подписок
+        собираются заново, повторная загрузка ничего не дублирует."""
+        call_command(
+            'seed_data', users=10, groups=2, posts=30, comments=40,
+            follows=3, seed=1, stdout=StringIO(),
+        )
+        dump = os.path.join(tempfile.mkdtemp(), 'dump.jsonl.gz')
+        call_command('export_posts', output=dump, stderr=StringIO())
+        expected = snapshot()
+        timeline_size = TimelineItem.objects.count()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        for _ in range(2):
+            call_command('import_posts', dump, stdout=StringIO())
+            actual = snapshot()
+            for model in expected:
+                with self.subTest(model=model):
+                    self.assertEqual(actual[model], expected[model])
+            self.assertEqual(TimelineItem.objects.count(), timeline_size)
+        post = Post.objects.create(author=User.objects.first(), text='Новый')
+        self.assertGreater(post.id, max(row[0] for row in expected[Post]))
+
+    def test_import_into_database_with_posts(self):
+        """Посты из выгрузки с занятыми id получают новые, их комментарии
+        переходят вместе с ними, местные посты не меняются."""
+        call_command(
+            'seed_data', users=5, groups=2, posts=10, comments=20,
+            follows=2, seed=1, stdout=StringIO(),
+        )
+        dump = os.path.join(tempfile.mkdtemp(), 'dump.jsonl')
+        call_command('export_posts', output=dump, stderr=StringIO())
+        expected = content()
+        post_id = Post.objects.order_by('id').values_list(
+            'id', flat=True
+        ).first()
+        comment_id = Comment.objects.order_by('id').values_list(
+            'id', flat=True
+        ).first()
+        Post.objects.all().delete()
+        # Местные записи занимают id записей из выгрузки.
+        local = Post.objects.create(
+            id=post_id,
+            author=User.objects.create_user('local'),
+            text='Местный пост',
+        )
+        Comment.objects.create(
+            id=comment_id,
+            post=local,
+            author=local.author,
+            text='Местный комментарий',
+        )
+        local_content = content()
+        # Мелкие пакеты и запросы: комментарии находят перенесенные посты
+        # из прошлых пакетов, списки значений делятся на запросы.
+        for _ in range(2):
+            with mock.patch.object(
+                connection.features, 'max_query_params', 4
+            ):
+                call_command(
+                    'import_posts', dump, batch_size=3, stdout=StringIO()
+                )
+            actual = content()
+            for model in expected:
+                with self.subTest(model=model):
+                    self.assertEqual(
+                        actual[model],
+                        sorted(expected[model] + local_content[model]),
+                    )
+
+    def test_import_rolls_back_inconsistent_dump(self):
+        """Комментарий к посту, которого нет в выгрузке, отменяет свой
+        пакет; уже загруженные пакеты остаются."""
+        dump = os.path.join(tempfile.mkdtemp(), 'dump.jsonl')
+        with open(dump, 'w') as file:
+            file.write(json.dumps({
+                'type': 'group', 'slug': 'g', 'title': 'Г', 'description': '',
+            }) + '\n')
+            file.write(json.dumps({
+                'type': 'comment', 'id': 1, 'post': 100, 'author': 'a',
+                'text': 'Т', 'created': '2022-01-01T00:00:00+00:00',
+            }) + '\n')
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_posts', dump, batch_size=1, stdout=StringIO()
+            )
+        self.assertTrue(Group.objects.filter(slug='g').exists())
+        self.assertFalse(User.objects.filter(username='a').exists())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_import_rejects_broken_records(self):
+        """Запись неизвестного типа останавливает загрузку с ошибкой."""
+        dump = os.path.join(tempfile.mkdtemp(), 'dump.jsonl')
+        with open(dump, 'w') as file:
+            file.write('{"type": "unknown"}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_posts', dump, stdout=StringIO())
+
+
+@override_settings(
+    THUMBNAIL_WORKERS=0,
+    NOTIFICATION_WORKERS=0,
+    SITE_URL='https://yatube.example',
+)
+class DigestTest(TestCase):
+
+    def test_send_digest(self):
+        """Каждый подписчик с адресом почты получает одно письмо с постами
+        за сутки; пакет пользователей читает ленты одним запросом, письма
+        уходят через одно соединение."""
+        author = User.objects.create_user('author', 'author@example.com')
+        readers = [
+            User.objects.create_user(f'reader_{i}', f'reader_{i}@example.com')
+            for i in range(3)
+        ]
+        silent = User.objects.create_user('silent')
+        User.objects.create_user('lonely', 'lonely@example.com')
+        for user in readers + [silent]:
+            Follow.objects.create(user=user, author=author)
+        old = Post.objects.create(author=author, text='Вчерашний пост')
+        old_date = timezone.now() - timedelta(days=2)
+        run_on_commit()
+        Post.objects.filter(id=old.id).update(pub_date=old_date)
+        TimelineItem.objects.filter(post=old).update(pub_date=old_date)
+        Post.objects.create(author=author, text='Сегодняшний пост')
+        run_on_commit()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('send_digest', batch_size=2, stdout=StringIO())
+        # Пользователи одним потоком и по запросу на пакет из двух:
+        # у пятерых есть адрес почты.
+        self.assertEqual(len(queries), 1 + 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [user.email for user in readers],
+        )
+        self.assertEqual(
+            len({id(message.connection) for message in mail.outbox}), 1
+        )
+        for message in mail.outbox:
+            with self.subTest(to=message.to):
+                self.assertIn('Сегодняшний пост', message.body)
+                self.assertNotIn('Вчерашний пост', message.body)
+                self.assertIn('https://yatube.example/posts/', message.body)
+
+    @override_settings(SITE_URL='')
+    def test_digest_requires_site_url(self):
+        """Без адреса сайта рассылка не уходит со ссылками в никуда."""
+        with self.assertRaises(ImproperlyConfigured):
+            call_command('send_digest', stdout=StringIO())
+        self.assertEqual(mail.outbox, [])
@@ -1,11 +1,13 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django import forms
+from PIL import Image
 
 
 from ..models import Post, Group, User, Comment
@@ -45,7 +47,7 @@ IMAGE_FOLDER = Post._meta.get_field("image").upload_to
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostFormsTest(TestCase):
 
     @classmethod
@@ -107,6 +109,28 @@ class PostFormsTest(TestCase):
             f'{IMAGE_FOLDER}{form_data["image"].name}'
         )
 
+    def test_image_upload_limits(self):
+        """Слишком большой файл, картинка сверх лимита пикселей и
+        неподдерживаемый формат отклоняются, пост не создается."""
+        bitmap = BytesIO()
+        Image.new('RGB', (2, 1)).save(bitmap, 'BMP')
+        cases = (
+            ({'UPLOAD_MAX_SIZE': len(IMAGE_CONTENT) - 1}, IMAGE_CONTENT),
+            ({'POST_IMAGE_MAX_PIXELS': 1}, IMAGE_CONTENT),
+            ({}, bitmap.getvalue()),
+        )
+        posts_count = Post.objects.count()
+        for limits, content in cases:
+            with self.subTest(limits=limits), override_settings(**limits):
+                response = self.authorized_client.post(POST_CREATE, {
+                    'text': 'Пост с картинкой',
+                    'image': SimpleUploadedFile('pic.png', content),
+                })
+                self.assertTrue(
+                    response.context['form'].has_error('image')
+                )
+                self.assertEqual(Post.objects.count(), posts_count)
+
     def test_edit_post(self):
         """Валидная форма редактирует запись в БД."""
         posts_count = Post.objects.count()
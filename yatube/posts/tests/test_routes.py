@@ -9,12 +9,19 @@ POST_ID = 1
 URL_ROUTES = (
     ('/', 'index', None),
     ('/create/', 'post_create', None),
+    ('/search/', 'search', None),
+    ('/popular/', 'popular', None),
+    ('/feed/rss/', 'feed', ('rss',)),
+    (f'/group/{TEST_SLUG}/feed/atom/', 'group_feed', (TEST_SLUG, 'atom')),
+    (f'/profile/{TEST_NAME}/feed/json/', 'profile_feed', (TEST_NAME, 'json')),
     (f'/profile/{TEST_NAME}/', 'profile', (TEST_NAME,)),
+    ('/group/', 'groups', None),
     (f'/group/{TEST_SLUG}/', 'group_list', (TEST_SLUG,)),
     (f'/posts/{POST_ID}/', 'post_detail', (POST_ID,)),
     (f'/posts/{POST_ID}/edit/', 'post_edit', (POST_ID,)),
     (f'/posts/{POST_ID}/comment/', 'add_comment', (POST_ID,)),
     ('/follow/', 'follow_index', None),
+    ('/notifications/', 'notification_index', None),
     (f'/profile/{TEST_NAME}/follow/', 'profile_follow', (TEST_NAME,)),
     (f'/profile/{TEST_NAME}/unfollow/', 'profile_unfollow', (TEST_NAME,)),
 )
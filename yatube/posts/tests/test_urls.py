@@ -12,9 +12,13 @@ TEST_NAME = 'test_name'
 TEST_NAME_2 = 'test_name_2'
 INDEX = reverse('posts:index')
 FOLLOW = reverse('posts:follow_index')
+NOTIFICATIONS = reverse('posts:notification_index')
 FOLLOW_USER = reverse('posts:profile_follow', args=[TEST_NAME])
 UNFOLLOW_USER = reverse('posts:profile_unfollow', args=[TEST_NAME])
 POST_CREATE = reverse('posts:post_create')
+SEARCH = reverse('posts:search')
+GROUPS = reverse('posts:groups')
+POPULAR = reverse('posts:popular')
 GROUP_LIST = reverse('posts:group_list', args=[TEST_SLUG])
 PROFILE = reverse('posts:profile', args=[TEST_NAME])
 LOGIN = reverse('users:login')
@@ -23,6 +27,7 @@ REDIRECT_LOGIN_POST_CREATE = f'{LOGIN}{NEXT}{POST_CREATE}'
 REDIRECT_LOGIN_FOLLOW = f'{LOGIN}{NEXT}{FOLLOW_USER}'
 REDIRECT_LOGIN_UNFOLLOW = f'{LOGIN}{NEXT}{UNFOLLOW_USER}'
 REDIRECT_LOGIN_FOLLOW_INDEX = f'{LOGIN}{NEXT}{FOLLOW}'
+REDIRECT_LOGIN_NOTIFICATIONS = f'{LOGIN}{NEXT}{NOTIFICATIONS}'
 UNEXISTING_PAGE = '/unexisting_page/'
 OK = HTTPStatus.OK
 REDIRECT = HTTPStatus.FOUND
@@ -58,6 +63,9 @@ class PostURLTest(TestCase):
         правами доступа."""
         pages_response = [
             [INDEX, self.client, OK],
+            [SEARCH, self.client, OK],
+            [GROUPS, self.client, OK],
+            [POPULAR, self.client, OK],
             [GROUP_LIST, self.client, OK],
             [PROFILE, self.client, OK],
             [self.POST_DETAIL, self.client, OK],
@@ -69,6 +77,8 @@ class PostURLTest(TestCase):
             [self.POST_EDIT, self.another_author, REDIRECT],
             [FOLLOW, self.client, REDIRECT],
             [FOLLOW, self.author, OK],
+            [NOTIFICATIONS, self.client, REDIRECT],
+            [NOTIFICATIONS, self.author, OK],
             [FOLLOW_USER, self.client, REDIRECT],
             [FOLLOW_USER, self.another_author, REDIRECT],
             [FOLLOW_USER, self.author, REDIRECT],
@@ -89,6 +99,7 @@ class PostURLTest(TestCase):
             [FOLLOW_USER, self.client, REDIRECT_LOGIN_FOLLOW],
             [UNFOLLOW_USER, self.client, REDIRECT_LOGIN_UNFOLLOW],
             [FOLLOW, self.client, REDIRECT_LOGIN_FOLLOW_INDEX],
+            [NOTIFICATIONS, self.client, REDIRECT_LOGIN_NOTIFICATIONS],
             [FOLLOW_USER, self.another_author, PROFILE],
             [UNFOLLOW_USER, self.another_author, PROFILE],
             [FOLLOW_USER, self.author, PROFILE],
@@ -102,12 +113,16 @@ class PostURLTest(TestCase):
         cache.clear()
         templates_url_names = {
             INDEX: 'posts/index.html',
+            SEARCH: 'posts/search.html',
+            GROUPS: 'posts/groups.html',
+            POPULAR: 'posts/popular.html',
             GROUP_LIST: 'posts/group_list.html',
             PROFILE: 'posts/profile.html',
             self.POST_DETAIL: 'posts/post_detail.html',
             self.POST_EDIT: 'posts/create_post.html',
             POST_CREATE: 'posts/create_post.html',
             FOLLOW: 'posts/follow.html',
+            NOTIFICATIONS: 'posts/notifications.html',
             UNEXISTING_PAGE: 'core/404.html',
         }
         for address, template in templates_url_names.items():
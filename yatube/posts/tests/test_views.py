@@ -1,13 +1,32 @@
+import json
+import os
 import shutil
 import tempfile
+from datetime import timedelta
+from unittest import mock
 
 from django.conf import settings
 from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from ..models import User, Group, Post, Follow
+from .. import feeds as feeds_module
+from .. import notifications, stats, thumbnails, timeline, trending
+from ..models import (
+    User, Group, GroupStats, Post, Follow, Comment, Notification, UserStats
+)
+from ..caching import index_generation
+from ..fulltext import filter_matching
+from ..seeding import explicit_dates
+from ..utils import encode_cursor
+from .utils import run_on_commit
 
 TEST_SLUG = 'test_slug'
 TEST_SLUG_2 = 'test_slug_2'
@@ -15,11 +34,18 @@ TEST_NAME = 'test_name'
 TEST_NAME_2 = 'test_name_2'
 INDEX = reverse('posts:index')
 FOLLOW = reverse('posts:follow_index')
+NOTIFICATIONS = reverse('posts:notification_index')
+POST_CREATE = reverse('posts:post_create')
+SEARCH = reverse('posts:search')
+GROUPS = reverse('posts:groups')
+POPULAR = reverse('posts:popular')
+FEED = reverse('posts:feed', args=['rss'])
 GROUP_LIST = reverse('posts:group_list', args=[TEST_SLUG])
 GROUP_LIST_2 = reverse('posts:group_list', args=[TEST_SLUG_2])
 FOLLOW_USER = reverse('posts:profile_follow', args=[TEST_NAME_2])
 UNFOLLOW_USER = reverse('posts:profile_unfollow', args=[TEST_NAME])
 PROFILE = reverse('posts:profile', args=[TEST_NAME])
+BADGE = '<span class="badge rounded-pill bg-danger">{}</span>'
 IMAGE_CONTENT = (
     b'\x47\x49\x46\x38\x39\x61\x02\x00'
     b'\x01\x00\x80\x00\x00\x00\x00\x00'
@@ -36,7 +62,9 @@ TEST_IMAGE = SimpleUploadedFile(
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0, NOTIFICATION_WORKERS=0
+)
 class PostViewsTest(TestCase):
 
     @classmethod
@@ -63,6 +91,7 @@ class PostViewsTest(TestCase):
             text='Тестовый пост',
             image=TEST_IMAGE
         )
+        run_on_commit()
         cls.POST_DETAIL = reverse('posts:post_detail', args=[cls.post.id])
         cls.authorized_user = Client()
         cls.authorized_user.force_login(cls.user)
@@ -137,6 +166,10 @@ class PostViewsTest(TestCase):
             )
             for i in range(settings.POSTS_PER_PAGE + 1)
         )
+        # bulk_create не отправляет сигналы: раскладываем посты по лентам
+        # и пересчитываем счетчики.
+        timeline.backfill(self.user_2.id, self.user.id)
+        stats.rebuild()
         pages = [
             [INDEX, settings.POSTS_PER_PAGE],
             [GROUP_LIST, settings.POSTS_PER_PAGE],
@@ -152,17 +185,76 @@ class PostViewsTest(TestCase):
                 response = self.authorized_user_2.get(page)
                 self.assertEqual(len(response.context['page_obj']), num_posts)
 
+    def test_cursor_pagination(self):
+        """Ленты листаются курсором без подсчета постов, курсоры ведут
+        на соседние страницы."""
+        cache.clear()
+        Post.objects.all().delete()
+        Post.objects.bulk_create(
+            Post(
+                author=self.user,
+                group=self.group,
+                text=f'Тестовый пост {i}',
+            )
+            for i in range(settings.POSTS_PER_PAGE + 1)
+        )
+        # bulk_create не отправляет сигналы: раскладываем посты по лентам
+        # и пересчитываем счетчики.
+        timeline.backfill(self.user_2.id, self.user.id)
+        stats.rebuild()
+        posts = list(Post.objects.all())
+        for url in (INDEX, GROUP_LIST, PROFILE, FOLLOW):
+            with self.subTest(url=url):
+                first_page = self.authorized_user_2.get(url)
+                next_cursor = first_page.context['page_obj'].next_cursor
+                response = self.authorized_user_2.get(
+                    f'{url}?cursor={next_cursor}'
+                )
+                page_obj = response.context['page_obj']
+                self.assertNotIn('count', page_obj.paginator.__dict__)
+                self.assertEqual(list(page_obj), posts[-1:])
+                self.assertFalse(page_obj.has_next())
+                self.assertTrue(page_obj.has_previous())
+                response = self.authorized_user_2.get(
+                    f'{url}?cursor={page_obj.previous_cursor}'
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    posts[:settings.POSTS_PER_PAGE]
+                )
+
     def test_cache_index_page(self):
-        """При удалении поста он останется в response.content /index/,
-        пока не отчистить кэш принудительно."""
+        """Главная страница отдается из кэша, пока посты не изменятся;
+        удаление поста сбрасывает кэш без ожидания таймаута, но только
+        после фиксации транзакции."""
+        cache.clear()
         response_1 = self.authorized_user.get(INDEX)
-        Post.objects.all().delete
+        Post.objects.update(text='Изменено в обход сигналов')
         response_2 = self.authorized_user.get(INDEX)
         self.assertEqual(response_1.content, response_2.content)
-        cache.clear()
+        generation = index_generation()
+        Post.objects.all().delete()
+        self.assertEqual(index_generation(), generation)
+        run_on_commit()
         response_3 = self.authorized_user.get(INDEX)
         self.assertNotEqual(response_1.content, response_3.content)
 
+    def test_index_cache_invalidation(self):
+        """Создание и редактирование поста сразу видны на главной."""
+        cache.clear()
+        self.authorized_user.get(INDEX)
+        self.authorized_user.post(POST_CREATE, data={'text': 'Новый пост'})
+        run_on_commit()
+        self.assertContains(self.authorized_user.get(INDEX), 'Новый пост')
+        self.authorized_user.post(
+            reverse('posts:post_edit', args=[self.post.id]),
+            data={'text': 'Отредактированный пост'},
+        )
+        run_on_commit()
+        self.assertContains(
+            self.authorized_user.get(INDEX), 'Отредактированный пост'
+        )
+
     def test_user_follow_author(self):
         """Авторизованный пользователь может подписываться
         на других пользователей."""
@@ -188,3 +280,393 @@ class PostViewsTest(TestCase):
                 author=self.user
             ).exists()
         )
+
+    def test_follow_index_timeline(self):
+        """Новый пост попадает в ленту подписчиков после фиксации, после
+        отписки посты автора из ленты пропадают."""
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        self.assertFalse(self.user_2.timeline.filter(post=post).exists())
+        run_on_commit()
+        response = self.authorized_user_2.get(FOLLOW)
+        self.assertEqual(response.context['page_obj'][0], post)
+        self.authorized_user_2.get(UNFOLLOW_USER)
+        response = self.authorized_user_2.get(FOLLOW)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertFalse(self.user_2.timeline.exists())
+
+    def test_notifications(self):
+        """Уведомления о посте пишутся после ответа пакетами всем
+        подписчикам автора, значок показывает непрочитанные из кэша
+        (и на закэшированной главной), страница уведомлений отмечает их
+        прочитанными."""
+        readers = [self.user_2] + [
+            User.objects.create_user(username=f'reader_{i}')
+            for i in range(2)
+        ]
+        for reader in readers[1:]:
+            Follow.objects.create(user=reader, author=self.user)
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        notified = Notification.objects.filter(post=post)
+        self.assertFalse(notified.exists())
+        with mock.patch.object(notifications, 'BATCH_SIZE', 2):
+            notifications.schedule(post)
+            notifications.schedule(post)
+        self.assertEqual(
+            set(notified.values_list('user', 'post')),
+            {(reader.id, post.id) for reader in readers},
+        )
+        cache.clear()
+        response = self.authorized_user_2.get(INDEX)
+        # Второе — о посте из setUpClass.
+        self.assertContains(response, BADGE.format(2))
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_user_2.get(PROFILE)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'posts_notification' in query['sql']
+        ])
+        response = self.authorized_user_2.get(NOTIFICATIONS)
+        self.assertEqual(response.context['page_obj'][0].post, post)
+        self.assertNotContains(response, 'badge rounded-pill')
+        response = self.authorized_user_2.get(INDEX)
+        self.assertNotContains(response, 'badge rounded-pill')
+        self.assertNotContains(self.client.get(INDEX), 'notifications-badge')
+        with override_settings(NOTIFICATION_BADGE_LIMIT=1):
+            Notification.objects.update(read=False)
+            Post.objects.create(author=self.user, text='Еще пост')
+            notifications.deliver(
+                Post.objects.latest('id').id, self.user.id, timezone.now()
+            )
+            response = self.authorized_user_2.get(GROUP_LIST)
+            self.assertContains(response, BADGE.format('1+'))
+
+    def test_notification_counter_race(self):
+        """Счетчик, посчитанный до рассылки и сохраненный после нее,
+        не прячет новые уведомления."""
+        cache.clear()
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        before = notifications.unread(self.user_2.id)
+        cache.clear()
+        add = cache.add
+
+        def add_after_delivery(*args, **kwargs):
+            notifications.deliver(post.id, self.user.id, post.pub_date)
+            return add(*args, **kwargs)
+
+        with mock.patch.object(cache, 'add', add_after_delivery):
+            self.assertEqual(notifications.unread(self.user_2.id), before)
+        self.assertEqual(notifications.unread(self.user_2.id), before + 1)
+
+    def test_profile_counters(self):
+        """Счетчики профиля обновляются при изменениях, страница профиля
+        не выполняет COUNT-запросов, команда reconcile_stats чинит
+        рассинхронизированные счетчики."""
+        Comment.objects.create(post=self.post, author=self.user, text='Т')
+        expected = {
+            'posts_count': 1,
+            'comments_count': 1,
+            'followers_count': 1,
+            'following_count': 0,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(PROFILE)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries
+        ))
+        profile_stats = response.context['stats']
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(profile_stats, field), value)
+        UserStats.objects.filter(user=self.user).update(posts_count=100)
+        call_command('reconcile_stats', stdout=open(os.devnull, 'w'))
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 1)
+
+    def test_group_directory(self):
+        """Счетчики групп следуют за публикацией, переносом и удалением
+        поста, каталог групп берется из кэша, лента группы не выполняет
+        COUNT-запросов. Каталог сбрасывается после фиксации."""
+        cache.clear()
+
+        def directory():
+            return {
+                group['slug']: (group['posts_count'], group['latest_post'])
+                for group in self.client.get(GROUPS).context['groups']
+            }
+
+        self.assertEqual(directory(), {
+            TEST_SLUG: (1, self.post.pub_date),
+            TEST_SLUG_2: (0, None),
+        })
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(GROUPS)
+        self.assertEqual(len(queries), 0)
+        newer = Post.objects.create(
+            author=self.user, group=self.group, text='Новый пост'
+        )
+        self.assertEqual(directory()[TEST_SLUG], (1, self.post.pub_date))
+        run_on_commit()
+        self.assertEqual(directory()[TEST_SLUG], (2, newer.pub_date))
+        self.authorized_user.post(
+            reverse('posts:post_edit', args=[newer.id]),
+            {'text': newer.text, 'group': self.another_group.id},
+        )
+        run_on_commit()
+        self.assertEqual(directory(), {
+            TEST_SLUG: (1, self.post.pub_date),
+            TEST_SLUG_2: (1, newer.pub_date),
+        })
+        Post.objects.get(id=newer.id).delete()
+        run_on_commit()
+        self.assertEqual(directory()[TEST_SLUG_2], (0, None))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(GROUP_LIST)
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries
+        ))
+        GroupStats.objects.filter(group=self.group).update(posts_count=100)
+        call_command('reconcile_stats', stdout=open(os.devnull, 'w'))
+        self.assertEqual(
+            GroupStats.objects.get(group=self.group).posts_count, 1
+        )
+
+    def test_popular(self):
+        """Комментарий поднимает рейтинг поста, свежие комментарии весят
+        больше старых, вкладка читает готовый список из кэша."""
+        cache.clear()
+        newer = Post.objects.create(author=self.user, text='Новый пост')
+        now = timezone.now()
+        half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+
+        def comment(post, created):
+            with explicit_dates(Comment._meta.get_field('created')):
+                Comment.objects.create(
+                    post=post, author=self.user, text='Т', created=created
+                )
+            run_on_commit()
+
+        def popular():
+            return list(self.client.get(POPULAR).context['posts'])
+
+        self.assertEqual(popular(), [])
+        for _ in range(3):
+            comment(self.post, now - 2 * half_life)
+        self.assertEqual(popular(), [self.post])
+        comment(newer, now)
+        self.assertEqual(popular(), [newer, self.post])
+        self.authorized_user.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'Свежий комментарий'},
+        )
+        run_on_commit()
+        with CaptureQueriesContext(connection) as queries:
+            top = trending.top()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(popular(), [self.post, newer])
+        trending.rebuild()
+        for (post_id, score), (rebuilt_id, rebuilt) in zip(
+            top, trending.top()
+        ):
+            with self.subTest(post_id=post_id):
+                self.assertEqual(post_id, rebuilt_id)
+                self.assertAlmostEqual(score, rebuilt)
+
+    def test_post_card_cache(self):
+        """Карточка поста берется из кэша, пока не изменятся данные
+        поста, группы или автора."""
+        cache.clear()
+        card = 'posts/includes/post_card.html'
+        self.assertTemplateUsed(self.client.get(PROFILE), card)
+        self.assertTemplateNotUsed(self.client.get(PROFILE), card)
+        group = Group.objects.get(id=self.group.id)
+        group.title = 'Новое название группы'
+        group.save()
+        response = self.client.get(PROFILE)
+        self.assertTemplateUsed(response, card)
+        self.assertContains(response, group.title)
+
+    def test_post_detail_comments(self):
+        """Комментарии на странице поста разбиты на страницы, новые
+        сверху, а число запросов не растет с числом комментариев."""
+        Comment.objects.create(post=self.post, author=self.user, text='0')
+        # Прогрев: пользователь запроса попадает в кэш.
+        self.authorized_user.get(self.POST_DETAIL)
+        with CaptureQueriesContext(connection) as one_comment:
+            self.authorized_user.get(self.POST_DETAIL)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=author, text=f'{i}')
+            for i, author in enumerate(
+                (self.user, self.user_2) * settings.COMMENTS_PER_PAGE, 1
+            )
+        )
+        with CaptureQueriesContext(connection) as many_comments:
+            response = self.authorized_user.get(self.POST_DETAIL)
+        self.assertEqual(len(one_comment), len(many_comments))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0], self.post.comments.first())
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент и комментариев сортируются по индексу, а не
+        временным B-деревом (EXPLAIN QUERY PLAN)."""
+        cache.clear()
+        cursor = f'?cursor={encode_cursor(self.post)}'
+        urls = (
+            INDEX, GROUP_LIST, PROFILE, FOLLOW, self.POST_DETAIL,
+            f'{INDEX}{cursor}', f'{GROUP_LIST}{cursor}',
+            f'{PROFILE}{cursor}',
+        )
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.authorized_user_2.get(url)
+            for query in queries:
+                if 'ORDER BY' not in query['sql']:
+                    continue
+                with self.subTest(url=url, sql=query['sql']):
+                    with connection.cursor() as db:
+                        db.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+                        plan = ' '.join(row[-1] for row in db.fetchall())
+                    self.assertNotIn('TEMP B-TREE', plan)
+                    self.assertIn('INDEX', plan)
+
+    def test_search(self):
+        """Поиск находит посты по словам, ранжирует по bm25, листается
+        курсором и видит изменения текста."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Яблоко {"яблоко " * i}груша')
+            for i in range(settings.POSTS_PER_PAGE + 1)
+        )
+        response = self.client.get(SEARCH, {'q': 'яблоко'})
+        posts = response.context['posts']
+        self.assertEqual(len(posts), settings.POSTS_PER_PAGE)
+        self.assertEqual(
+            posts[0].text.count('яблоко'), settings.POSTS_PER_PAGE
+        )
+        response = self.client.get(
+            SEARCH, {'q': 'яблоко', 'cursor': response.context['next_cursor']}
+        )
+        self.assertEqual(len(response.context['posts']), 1)
+        self.assertIsNone(response.context['next_cursor'])
+        self.post.text = 'Слива'
+        self.post.save()
+        response = self.client.get(SEARCH, {'q': 'слива'})
+        self.assertEqual(response.context['posts'], [self.post])
+        response = self.client.get(SEARCH, {'q': 'Тестовый'})
+        self.assertEqual(response.context['posts'], [])
+        self.assertEqual(
+            filter_matching(Post.objects.all(), '"груша"').count(),
+            settings.POSTS_PER_PAGE + 1
+        )
+
+    def test_thumbnail_placeholder(self):
+        """Пока миниатюра не готова, карточка показывает заглушку и не
+        кэшируется; готовая миниатюра попадает в карточку."""
+        cache.clear()
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            response = self.client.get(PROFILE)
+        schedule.assert_called_once_with(self.post.image.name)
+        self.assertContains(response, 'aspect-ratio')
+        self.assertNotContains(response, '<img class="card-img')
+        response = self.client.get(PROFILE)
+        self.assertContains(response, '<img class="card-img')
+        self.assertNotContains(response, 'aspect-ratio')
+
+    def test_thumbnail_failure(self):
+        """Отсутствующая или испорченная картинка не дает вариантов с
+        битыми адресами и не ставится в очередь на каждой отрисовке."""
+        cache.clear()
+        broken = default_storage.save(
+            'posts/broken.gif', ContentFile(b'not an image')
+        )
+        for name in ('posts/missing.gif', broken):
+            with self.subTest(name=name):
+                with self.assertLogs('posts.thumbnails', 'ERROR'):
+                    self.assertFalse(thumbnails.generate(name))
+                self.assertIsNone(cache.get(thumbnails.variants_key(name)))
+                with mock.patch('posts.thumbnails.schedule') as schedule:
+                    self.assertEqual(
+                        thumbnails.variants([Post(image=name).image]), {}
+                    )
+                schedule.assert_not_called()
+
+    def test_thumbnail_refreshes_cached_index(self):
+        """Нарезанные в фоне миниатюры сразу видны на закэшированной
+        главной."""
+        cache.clear()
+        with mock.patch('posts.thumbnails.schedule'):
+            response = self.client.get(INDEX)
+            self.assertNotContains(response, '<img class="card-img')
+            with mock.patch('posts.thumbnails.connection'):
+                thumbnails._work(self.post.image.name)
+            response = self.client.get(INDEX)
+        self.assertContains(response, '<img class="card-img')
+
+    def test_image_variants_srcset(self):
+        """Карточка и страница поста отдают srcset по всем ширинам
+        и форматам, которые умеет кодировать Pillow."""
+        cache.clear()
+        formats = thumbnails.formats()
+        self.assertIn('JPEG', formats)
+        for url in (PROFILE, self.POST_DETAIL):
+            with self.subTest(url=url):
+                content = self.client.get(url).content.decode()
+                for width in settings.POST_IMAGE_WIDTHS:
+                    self.assertEqual(
+                        content.count(f' {width}w'), len(formats)
+                    )
+                self.assertIn('sizes="', content)
+                self.assertEqual(
+                    'type="image/webp"' in content, 'WEBP' in formats
+                )
+
+    def test_feeds(self):
+        """Ленты сайта, группы и автора отдаются потоком во всех форматах,
+        а повторный запрос получает 304 без выборки постов."""
+        feeds = (
+            FEED,
+            reverse('posts:feed', args=['atom']),
+            reverse('posts:group_feed', args=[TEST_SLUG, 'rss']),
+            reverse('posts:profile_feed', args=[TEST_NAME, 'atom']),
+        )
+        for url in feeds:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.streaming)
+                self.assertIn(
+                    self.post.text, b''.join(response).decode()
+                )
+        response = self.client.get(
+            reverse('posts:profile_feed', args=[TEST_NAME, 'json'])
+        )
+        items = json.loads(b''.join(response))['items']
+        self.assertEqual(items[0]['content_text'], self.post.text)
+        response = self.client.get(FEED)
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(
+                FEED, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(
+            FEED, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.client.get(FEED, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        for fmt in feeds_module.WRITERS:
+            for url in (
+                reverse('posts:group_feed', args=[TEST_SLUG_2, fmt]),
+                reverse('posts:profile_feed', args=[TEST_NAME_2, fmt]),
+            ):
+                with self.subTest(url=url):
+                    response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotIn('ETag', response)
+                    self.assertTrue(b''.join(response))
+        unknown = (
+            reverse('posts:feed', args=['xml']),
+            reverse('posts:group_feed', args=['unknown', 'rss']),
+        )
+        for url in unknown:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,9 @@
+from django.db import connection
+
+
+def run_on_commit():
+    """Выполняет отложенные on_commit: TestCase не фиксирует
+    транзакцию, и сами они не срабатывают."""
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
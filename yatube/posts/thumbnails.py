@@ -0,0 +1,145 @@
+"""Фоновая нарезка вариантов картинок постов.
+
+Для каждой картинки готовятся варианты всех ширин из
+settings.POST_IMAGE_WIDTHS во всех форматах POST_IMAGE_FORMATS, которые
+умеет сохранять Pillow. Нарезка идет в пуле потоков сразу после
+загрузки картинки. Шаблоны берут готовые srcset из кэша и до их
+появления показывают заглушку, поэтому запрос страницы никогда не
+декодирует и не масштабирует изображение. Неудачная нарезка (файла нет
+или он не читается) оставляет метку на THUMBNAIL_FAILURE_TIMEOUT
+секунд, и до ее истечения картинка не ставится в очередь заново.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from .caching import invalidate_index
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = set()
+_executor = None
+
+
+def variants_key(name):
+    return f'image_variants:{name}'
+
+
+def failure_key(name):
+    return f'image_variants_failed:{name}'
+
+
+def formats():
+    """Форматы из настроек, для которых в Pillow есть кодировщик."""
+    Image.init()
+    return [fmt for fmt in settings.POST_IMAGE_FORMATS if fmt in Image.SAVE]
+
+
+def generate(name):
+    """Нарезает все варианты картинки и кладет в кэш
+    {'src': адрес, формат: srcset}; src — самый широкий вариант
+    последнего формата (запасного для старых браузеров). sorl при
+    ошибке возвращает несуществующий файл, поэтому каждый вариант
+    проверяется; при неудаче в кэш кладется метка.
+    Возвращает True, если варианты готовы."""
+    width, height = settings.POST_IMAGE_SIZE
+    try:
+        if not default_storage.exists(name):
+            raise FileNotFoundError(name)
+        variants = {}
+        for fmt in formats():
+            srcset = []
+            for size in settings.POST_IMAGE_WIDTHS:
+                thumbnail = get_thumbnail(
+                    name,
+                    f'{size}x{round(size * height / width)}',
+                    crop='center',
+                    upscale=True,
+                    format=fmt,
+                )
+                if not thumbnail.exists():
+                    raise ValueError(f'Миниатюра {thumbnail.name} не создана')
+                srcset.append(f'{thumbnail.url} {size}w')
+                variants['src'] = thumbnail.url
+            variants[fmt.lower()] = ', '.join(srcset)
+        cache.set(variants_key(name), variants, None)
+        return True
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры для %s', name)
+        cache.set(failure_key(name), True, settings.THUMBNAIL_FAILURE_TIMEOUT)
+        return False
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def _work(name):
+    try:
+        if generate(name):
+            # Главная кэшируется целиком и могла сохраниться с заглушкой.
+            invalidate_index()
+    finally:
+        connection.close()
+
+
+def executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def schedule(name):
+    """Ставит картинку в очередь нарезки. Без пула (THUMBNAIL_WORKERS = 0)
+    миниатюры готовятся сразу."""
+    if not name:
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if not settings.THUMBNAIL_WORKERS:
+        generate(name)
+        return
+    executor().submit(_work, name)
+
+
+def schedule_on_commit(name):
+    """Ставит картинку в очередь после фиксации транзакции, чтобы нарезка
+    не начиналась для поста, который еще может откатиться."""
+    if name:
+        transaction.on_commit(lambda: schedule(name))
+
+
+def variants(images):
+    """Готовые варианты {имя файла: {'src': ..., формат: srcset}} одним
+    get_many. Неготовые картинки (например, загруженные другим
+    процессом) ставятся в очередь нарезки, если нарезка недавно не
+    провалилась."""
+    names = {image.name for image in images if image}
+    found = cache.get_many(
+        [variants_key(name) for name in names]
+        + [failure_key(name) for name in names]
+    )
+    ready = {}
+    for name in names:
+        image = found.get(variants_key(name))
+        if image is None and failure_key(name) not in found:
+            schedule(name)
+            # Без пула варианты уже нарезаны.
+            image = cache.get(variants_key(name))
+        if image is not None:
+            ready[name] = image
+    return ready
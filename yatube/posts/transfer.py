@@ -0,0 +1,301 @@
+"""Потоковая выгрузка и загрузка контента в формате JSONL.
+
+Каждая строка — одна запись: группа, пост, комментарий или подписка.
+Выгрузка идет в порядке зависимостей, чтобы загрузка могла читать поток
+один раз. Пользователи и группы ссылаются по username и slug и
+разрешаются запросами на пакет, недостающие создаются. Посты и
+комментарии по возможности сохраняют свои id; при совпадении id с
+чужой записью пост получает новый (см. Loader). Комментарий ссылается
+на пост еще и по естественному ключу (автор и время публикации), так
+что переназначенные id не нужно держать в памяти.
+
+Каждый пакет фиксируется отдельно: загрузка не держит блокировку записи
+SQLite все время и не раздувает WAL. Ошибка откатывает только текущий
+пакет; повторная загрузка того же файла ничего не дублирует и доводит
+загрузку до конца. В памяти держится только текущий пакет.
+"""
+import json
+from itertools import groupby
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import stats, timeline, trending
+from .caching import invalidate_index
+from .models import Comment, Follow, Group, Post, User
+from .seeding import explicit_dates
+from .utils import batched
+
+BATCH_SIZE = 5000
+GROUP, POST, COMMENT, FOLLOW = 'group', 'post', 'comment', 'follow'
+
+
+def records():
+    """Все записи в порядке зависимостей."""
+    for slug, title, description in Group.objects.order_by('id').values_list(
+        'slug', 'title', 'description'
+    ).iterator(chunk_size=BATCH_SIZE):
+        yield {
+            'type': GROUP,
+            'slug': slug,
+            'title': title,
+            'description': description,
+        }
+    posts = Post.objects.order_by('id').values_list(
+        'id', 'author__username', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    for post_id, author, group, text, pub_date, image in posts.iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        yield {
+            'type': POST,
+            'id': post_id,
+            'author': author,
+            'group': group,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'image': image,
+        }
+    comments = Comment.objects.order_by('id').values_list(
+        'id', 'post_id', 'post__author__username', 'post__pub_date',
+        'author__username', 'text', 'created',
+    )
+    for (
+        comment_id, post_id, post_author, post_pub_date, author, text,
+        created,
+    ) in comments.iterator(chunk_size=BATCH_SIZE):
+        yield {
+            'type': COMMENT,
+            'id': comment_id,
+            'post': post_id,
+            'post_author': post_author,
+            'post_pub_date': post_pub_date.isoformat(),
+            'author': author,
+            'text': text,
+            'created': created.isoformat(),
+        }
+    follows = Follow.objects.order_by('id').values_list(
+        'user__username', 'author__username'
+    )
+    for user, author in follows.iterator(chunk_size=BATCH_SIZE):
+        yield {'type': FOLLOW, 'user': user, 'author': author}
+
+
+def dump(stream):
+    """Пишет записи в stream построчно. Возвращает их число."""
+    total = 0
+    for record in records():
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        total += 1
+    return total
+
+
+def filter_in(queryset, field, values):
+    """Строки queryset, у которых field из values. Значения делятся на
+    запросы по max_query_params: старые сборки SQLite принимают не больше
+    999 параметров."""
+    values = list(values)
+    size = connection.features.max_query_params or len(values) or 1
+    for start in range(0, len(values), size):
+        yield from queryset.filter(
+            **{f'{field}__in': values[start:start + size]}
+        )
+
+
+def user_ids(usernames):
+    """{username: id}; недостающие пользователи создаются без пароля."""
+    usernames = set(usernames)
+    users = User.objects.values_list('username', 'id')
+    found = dict(filter_in(users, 'username', usernames))
+    missing = usernames - found.keys()
+    if missing:
+        password = make_password(None)
+        User.objects.bulk_create(
+            (User(username=username, password=password)
+             for username in missing),
+            ignore_conflicts=True,
+        )
+        found.update(filter_in(users, 'username', missing))
+    return found
+
+
+def group_ids(slugs):
+    slugs = set(slugs) - {None}
+    groups = Group.objects.values_list('slug', 'id')
+    found = dict(filter_in(groups, 'slug', slugs))
+    missing = slugs - found.keys()
+    if missing:
+        Group.objects.bulk_create(
+            (Group(slug=slug, title=slug) for slug in missing),
+            ignore_conflicts=True,
+        )
+        found.update(filter_in(groups, 'slug', missing))
+    return found
+
+
+class Loader:
+    """Загрузка пакетов по типам записей.
+
+    Пост или комментарий сохраняет свой id, если тот свободен. Занятый id
+    принадлежит чужой записи, поэтому она вставляется с новым id.
+    Комментарий находит свой пост по автору и времени публикации поста.
+    Уже загруженные записи узнаются по тому же естественному ключу, так
+    что повторная загрузка ничего не дублирует.
+    """
+
+    def groups(self, batch):
+        Group.objects.bulk_create(
+            (
+                Group(
+                    slug=record['slug'],
+                    title=record['title'],
+                    description=record['description'],
+                )
+                for record in batch
+            ),
+            ignore_conflicts=True,
+        )
+
+    def posts(self, batch):
+        authors = user_ids(record['author'] for record in batch)
+        groups = group_ids(record['group'] for record in batch)
+        posts = {
+            record['id']: Post(
+                id=record['id'],
+                author_id=authors[record['author']],
+                group_id=groups.get(record['group']),
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+                image=record['image'],
+            )
+            for record in batch
+        }
+        insert(Post, posts, ('author_id', 'pub_date'))
+
+    def post_ids(self, batch):
+        """{id поста из выгрузки: id в базе} для комментариев пакета.
+        Без ключа поста (старые выгрузки) id берется как есть."""
+        keys = {
+            record['post']: (
+                record['post_author'],
+                parse_datetime(record['post_pub_date']),
+            )
+            for record in batch if 'post_author' in record
+        }
+        authors = user_ids(author for author, _ in keys.values())
+        local = {
+            (author_id, pub_date): post_id
+            for author_id, pub_date, post_id in filter_in(
+                Post.objects.values_list('author_id', 'pub_date', 'id'),
+                'pub_date',
+                {pub_date for _, pub_date in keys.values()},
+            )
+        }
+        ids = {record['post']: record['post'] for record in batch}
+        for source_id, (author, pub_date) in keys.items():
+            ids[source_id] = local.get((authors[author], pub_date))
+        found = set(filter_in(
+            Post.objects.values_list('id', flat=True), 'id',
+            set(ids.values()) - {None},
+        ))
+        missing = [
+            source_id for source_id, post_id in ids.items()
+            if post_id not in found
+        ]
+        if missing:
+            raise ValueError(f'Нет постов для комментариев: {sorted(missing)}')
+        return ids
+
+    def comments(self, batch):
+        authors = user_ids(record['author'] for record in batch)
+        post_ids = self.post_ids(batch)
+        comments = {
+            record['id']: Comment(
+                id=record['id'],
+                post_id=post_ids[record['post']],
+                author_id=authors[record['author']],
+                text=record['text'],
+                created=parse_datetime(record['created']),
+            )
+            for record in batch
+        }
+        insert(Comment, comments, ('post_id', 'author_id', 'created'))
+
+    def follows(self, batch):
+        users = user_ids(
+            username for record in batch
+            for username in (record['user'], record['author'])
+        )
+        Follow.objects.bulk_create(
+            (
+                Follow(
+                    user_id=users[record['user']],
+                    author_id=users[record['author']],
+                )
+                for record in batch
+            ),
+            ignore_conflicts=True,
+        )
+
+    def __getitem__(self, kind):
+        return {
+            GROUP: self.groups,
+            POST: self.posts,
+            COMMENT: self.comments,
+            FOLLOW: self.follows,
+        }[kind]
+
+
+def insert(model, objects, key):
+    """Вставляет {id из выгрузки: объект}, пропуская уже загруженные по
+    естественному ключу key (последнее поле — время, по нему ищутся
+    кандидаты). Объекты с занятым id получают новый."""
+    loaded = set(filter_in(
+        model.objects.values_list(*key), key[-1],
+        {getattr(obj, key[-1]) for obj in objects.values()},
+    ))
+    taken = set(filter_in(
+        model.objects.values_list('id', flat=True), 'id', objects
+    ))
+    new = []
+    for source_id, obj in objects.items():
+        if tuple(getattr(obj, field) for field in key) in loaded:
+            continue
+        if source_id in taken:
+            obj.id = None
+        new.append(obj)
+    model.objects.bulk_create(new)
+
+
+def load(stream, batch_size=BATCH_SIZE):
+    """Загружает записи из stream пакетами bulk_create и пересчитывает
+    то, что пакетная вставка обходит: ленты подписок, счетчики профилей
+    и групп, рейтинги популярного, кэш главной и счетчики автоинкремента.
+    Возвращает {тип: число}."""
+    loaded = dict.fromkeys((GROUP, POST, COMMENT, FOLLOW), 0)
+    loader = Loader()
+    lines = (json.loads(line) for line in stream if line.strip())
+    with explicit_dates(
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ):
+        for batch in batched(lines, batch_size):
+            with transaction.atomic():
+                for kind, records in groupby(
+                    batch, key=lambda r: r['type']
+                ):
+                    records = list(records)
+                    loader[kind](records)
+                    loaded[kind] += len(records)
+    reset = connection.ops.sequence_reset_sql(no_style(), [Post, Comment])
+    if reset:
+        with connection.cursor() as cursor:
+            for sql in reset:
+                cursor.execute(sql)
+    timeline.rebuild()
+    stats.rebuild()
+    trending.rebuild()
+    invalidate_index()
+    return loaded
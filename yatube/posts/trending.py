@@ -0,0 +1,127 @@
+"""Вкладка «Популярное»: рейтинг постов по свежим комментариям.
+
+Комментарий дает посту вес 2 ** (t / TRENDING_HALF_LIFE), где t — время
+комментария: каждый период полураспада новые комментарии весят вдвое
+больше прежних. Сравнивать суммы таких весов — то же, что сравнивать
+оценки, которые убывают со временем, поэтому старые рейтинги не нужно
+пересчитывать. Чтобы веса не переполняли float, хранится натуральный
+логарифм суммы, и комментарий добавляется одним UPDATE:
+ln(e^s + e^x) = max(s, x) + ln(1 + e^-|s - x|).
+
+Первые TRENDING_SIZE постов лежат в кэше списком (post_id, рейтинг).
+После фиксации комментария, который может изменить список, он
+перечитывается из индекса по рейтингу целиком, а не правится на месте:
+иначе из двух одновременных комментариев один бы потерялся.
+"""
+import math
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+
+from .models import Comment, Post, PostScore
+from .utils import batched
+
+BATCH_SIZE = 1000
+TOP_KEY = 'trending:top'
+LN2 = math.log(2)
+
+
+def weight(moment):
+    """Логарифм веса комментария, оставленного в момент moment."""
+    return moment.timestamp() * LN2 / settings.TRENDING_HALF_LIFE
+
+
+def log_sum(weights):
+    """ln(сумма e^x) без переполнения."""
+    weights = list(weights)
+    top = max(weights)
+    return top + math.log(sum(math.exp(x - top) for x in weights))
+
+
+def record(post_id, moment):
+    """Добавляет к рейтингу поста комментарий и поднимает пост
+    в списке популярных."""
+    x = Value(weight(moment), output_field=FloatField())
+    updated = PostScore.objects.filter(post_id=post_id).update(
+        score=Greatest(F('score'), x)
+        + Ln(1 + Exp(-Abs(F('score') - x)))
+    )
+    if not updated:
+        _, created = PostScore.objects.get_or_create(
+            post_id=post_id, defaults={'score': weight(moment)}
+        )
+        if not created:
+            return record(post_id, moment)
+    score = PostScore.objects.values_list('score', flat=True).get(
+        post_id=post_id
+    )
+    transaction.on_commit(lambda: promote(post_id, score))
+
+
+def promote(post_id, score):
+    """Перечитывает список популярных, если пост с новым рейтингом
+    в него попадает или уже в нем есть."""
+    top = cache.get(TOP_KEY)
+    if top is None:
+        return
+    if (
+        len(top) >= settings.TRENDING_SIZE
+        and score < top[-1][1]
+        and post_id not in dict(top)
+    ):
+        return
+    refresh()
+
+
+def refresh():
+    top = list(
+        PostScore.objects.order_by('-score')
+        .values_list('post_id', 'score')[:settings.TRENDING_SIZE]
+    )
+    cache.set(TOP_KEY, top, settings.TRENDING_TIMEOUT)
+    return top
+
+
+def top():
+    """[(post_id, рейтинг)] популярных постов, от лучшего."""
+    top = cache.get(TOP_KEY)
+    if top is None:
+        top = refresh()
+    return top
+
+
+def posts():
+    """Популярные посты в порядке рейтинга; удаленные пропускаются."""
+    ids = [post_id for post_id, _ in top()]
+    found = Post.objects.select_related('author', 'group').in_bulk(ids)
+    return [found[post_id] for post_id in ids if post_id in found]
+
+
+def rebuild():
+    """Пересчитывает рейтинги по всем комментариям одним проходом.
+    Возвращает число постов с рейтингом."""
+    comments = (
+        Comment.objects.order_by('post_id')
+        .values_list('post_id', 'created')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    scores = (
+        PostScore(
+            post_id=post_id,
+            score=log_sum(weight(created) for _, created in rows),
+        )
+        for post_id, rows in groupby(comments, key=itemgetter(0))
+    )
+    total = 0
+    with transaction.atomic():
+        PostScore.objects.all().delete()
+        for batch in batched(scores, BATCH_SIZE):
+            PostScore.objects.bulk_create(batch)
+            total += len(batch)
+    cache.delete(TOP_KEY)
+    return total
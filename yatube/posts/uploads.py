@@ -0,0 +1,27 @@
+"""Загрузка файлов с ограниченной памятью.
+
+Файл пишется во временный файл кусками, поэтому память воркера не
+зависит от размера загрузки, а проверка картинки читает только
+заголовок с диска. Байты сверх settings.UPLOAD_MAX_SIZE не пишутся
+вовсе: такая загрузка помечается truncated, и форма ее отклоняет.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.truncated = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.UPLOAD_MAX_SIZE:
+            self.truncated = True
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.truncated = self.truncated
+        return upload
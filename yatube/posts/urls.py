@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
@@ -8,12 +8,24 @@ urlpatterns = [
     path('',
          views.index,
          name='index'),
+    path('feed/<str:fmt>/',
+         feeds.site_feed,
+         name='feed'),
+    path('group/',
+         views.groups,
+         name='groups'),
     path('group/<slug:slug>/',
          views.group_posts,
          name='group_list'),
+    path('group/<slug:slug>/feed/<str:fmt>/',
+         feeds.group_feed,
+         name='group_feed'),
     path('profile/<str:username>/',
          views.profile,
          name='profile'),
+    path('profile/<str:username>/feed/<str:fmt>/',
+         feeds.profile_feed,
+         name='profile_feed'),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
@@ -23,12 +35,21 @@ urlpatterns = [
     path('posts/<int:post_id>/',
          views.post_detail,
          name='post_detail'),
+    path('popular/',
+         views.popular,
+         name='popular'),
+    path('search/',
+         views.search,
+         name='search'),
     path('create/',
          views.post_create,
          name='post_create'),
     path('follow/',
          views.follow_index,
          name='follow_index'),
+    path('notifications/',
+         views.notification_index,
+         name='notification_index'),
     path('profile/<str:username>/follow/',
          views.profile_follow,
          name='profile_follow'),
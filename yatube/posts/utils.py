@@ -1,12 +1,134 @@
-from django.core.paginator import Paginator
+from itertools import islice
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 from django.conf import settings
 
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def batched(iterable, size):
+    """Разбивает поток на списки длиной не больше size."""
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def encode_cursor(obj, id_field='id', direction=NEXT):
+    """Кодирует позицию записи в ленте (pub_date, id) в строку для URL."""
+    return urlsafe_base64_encode(force_bytes(
+        f'{direction}|{obj.pub_date.isoformat()}|{getattr(obj, id_field)}'
+    ))
+
+
+def decode_cursor(cursor):
+    """Раскодирует курсор. Для испорченного курсора возвращает None."""
+    try:
+        direction, pub_date, post_id = (
+            urlsafe_base64_decode(cursor).decode().split('|')
+        )
+        pub_date = parse_datetime(pub_date)
+        post_id = int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, post_id
+
+
+class CursorPage(Page):
+    """Страница ленты, построенная по курсору, без подсчета записей."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        id_field = paginator.id_field
+        self.next_cursor = (
+            encode_cursor(object_list[-1], id_field)
+            if has_next and object_list else None
+        )
+        self.previous_cursor = (
+            encode_cursor(object_list[0], id_field, PREVIOUS)
+            if has_previous and object_list else None
+        )
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id): не выполняет COUNT(*) и OFFSET,
+    поэтому глубокие страницы открываются так же быстро, как первая."""
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page, id_field='id', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.id_field = id_field
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor) if cursor else None
+        descending = ('-pub_date', f'-{self.id_field}')
+        if position is None:
+            return self._page(self.object_list.order_by(*descending))
+        direction, pub_date, post_id = position
+        if direction == NEXT:
+            return self._page(
+                self.object_list.filter(
+                    Q(pub_date__lt=pub_date)
+                    | Q(pub_date=pub_date,
+                        **{f'{self.id_field}__lt': post_id})
+                ).order_by(*descending),
+                has_previous=True,
+            )
+        posts = list(
+            self.object_list.filter(
+                Q(pub_date__gt=pub_date)
+                | Q(pub_date=pub_date, **{f'{self.id_field}__gt': post_id})
+            ).order_by('pub_date', self.id_field)[:self.per_page + 1]
+        )
+        if len(posts) <= self.per_page:
+            # Дошли до начала ленты: отдаем полную первую страницу.
+            return self.get_page(None)
+        posts = posts[:self.per_page]
+        posts.reverse()
+        return CursorPage(posts, self, has_next=True, has_previous=True)
+
+    def _page(self, post_list, has_previous=False):
+        posts = list(post_list[:self.per_page + 1])
+        return CursorPage(
+            posts[:self.per_page],
+            self,
+            has_next=len(posts) > self.per_page,
+            has_previous=has_previous,
+        )
+
 
-def paginator(request, post_list):
-    return Paginator(
-        post_list,
-        settings.POSTS_PER_PAGE
-    ).get_page(
-        request.GET.get('page')
+def paginator(request, post_list, id_field='id', count=None):
+    """Страница ленты: по ?cursor= без подсчета, иначе по номеру.
+    Известное заранее число записей (count) избавляет от COUNT(*)."""
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        return CursorPaginator(
+            post_list,
+            settings.POSTS_PER_PAGE,
+            id_field=id_field,
+        ).get_page(cursor)
+    pages = Paginator(post_list, settings.POSTS_PER_PAGE)
+    if count is not None:
+        pages.count = count
+    page = pages.get_page(request.GET.get('page'))
+    page.next_cursor = (
+        encode_cursor(page[-1], id_field) if page.has_next() else None
     )
+    return page
@@ -1,13 +1,21 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, render, redirect
-from django.views.decorators.cache import cache_page
 
+from core.ratelimit import ratelimit
+
+from . import notifications, thumbnails, trending
+from .caching import cache_index
+from .cards import attach_cards
 from .forms import PostForm, CommentForm
+from .fulltext import search as search_posts
 from .models import Group, Post, User, Follow
+from .stats import group_directory, group_stats_for, stats_for
 from .utils import paginator
 
 
-@cache_page(20, key_prefix='index_page')
+@cache_index
 def index(request):
     post_list = (
         Post.objects
@@ -15,23 +23,46 @@ def index(request):
         .select_related('group')
         .all()
     )
+    page_obj = paginator(request, post_list)
+    attach_cards(page_obj)
     return render(request, 'posts/index.html', {
-        'page_obj': paginator(request, post_list)
+        'page_obj': page_obj
+    })
+
+
+def groups(request):
+    return render(request, 'posts/groups.html', {
+        'groups': group_directory()
     })
 
 
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(
+        Group.objects.select_related('stats'),
+        slug=slug
+    )
     post_list = group.posts.select_related('author').all()
+    page_obj = paginator(
+        request,
+        post_list,
+        count=group_stats_for(group).posts_count
+    )
+    attach_cards(page_obj, skip_group_info=True)
     return render(request, 'posts/group_list.html', {
         'group': group,
-        'page_obj': paginator(request, post_list)
+        'page_obj': page_obj
     })
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
     post_list = author.posts.select_related('group').all()
+    stats = stats_for(author)
+    page_obj = paginator(request, post_list, count=stats.posts_count)
+    attach_cards(page_obj, skip_author_info=True)
     following = (
         request.user.is_authenticated
         and request.user != author
@@ -41,18 +72,49 @@ def profile(request, username):
     )
     return render(request, 'posts/profile.html', {
         'author': author,
-        'page_obj': paginator(request, post_list),
+        'stats': stats,
+        'page_obj': page_obj,
         'following': following,
     })
 
 
 def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id
+    )
+    comments = Paginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE
+    ).get_page(request.GET.get('page'))
     return render(request, 'posts/post_detail.html', {
-        'post': get_object_or_404(Post, id=post_id),
+        'post': post,
+        'stats': stats_for(post.author),
+        'comments': comments,
         'form': CommentForm(),
     })
 
 
+def popular(request):
+    posts = trending.posts()
+    attach_cards(posts)
+    return render(request, 'posts/popular.html', {
+        'posts': posts
+    })
+
+
+def search(request):
+    query = request.GET.get('q', '')
+    posts, next_cursor = search_posts(query, request.GET.get('cursor'))
+    attach_cards(posts)
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    })
+
+
+@ratelimit('post_create')
 @login_required
 def post_create(request):
     form = PostForm(
@@ -64,6 +126,7 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    thumbnails.schedule_on_commit(post.image.name)
     return redirect('posts:profile', post.author)
 
 
@@ -83,9 +146,12 @@ def post_edit(request, post_id):
             'form': form
         })
     form.save()
+    if 'image' in form.changed_data:
+        thumbnails.schedule_on_commit(post.image.name)
     return redirect('posts:post_detail', post.id)
 
 
+@ratelimit('add_comment')
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -100,12 +166,33 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    page_obj = paginator(
+        request,
+        request.user.timeline.select_related('post__author', 'post__group'),
+        id_field='post_id',
+    )
+    page_obj.object_list = [item.post for item in page_obj]
+    attach_cards(page_obj)
     return render(request, 'posts/follow.html', {
-        'page_obj': paginator(request, post_list)
+        'page_obj': page_obj
+    })
+
+
+@login_required
+def notification_index(request):
+    page_obj = paginator(
+        request,
+        request.user.notifications.select_related(
+            'post__author', 'post__group'
+        ),
+    )
+    notifications.mark_read(request.user, page_obj)
+    return render(request, 'posts/notifications.html', {
+        'page_obj': page_obj
     })
 
 
+@ratelimit('profile_follow', methods=('GET', 'POST'))
 @login_required
 def profile_follow(request, username):
     if request.user.username != username:
@@ -0,0 +1,35 @@
+"""Вход по модели пользователя с коротким кэшем самого пользователя.
+
+AuthenticationMiddleware на каждом запросе достает пользователя по id
+из сессии. Этот бэкенд держит его в кэше USER_CACHE_TIMEOUT секунд, а
+сессии живут в кэше (SESSION_ENGINE), поэтому страницы авторизованного
+читателя не обращаются ни к django_session, ни к auth_user.
+
+Запись сбрасывается при любом сохранении пользователя (смена и сброс
+пароля, last_login при входе), удалении и выходе. Хэш пароля в сессии
+сверяется с пользователем из кэша, так что устаревшая запись после
+смены пароля разлогинила бы пользователя.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def forget(user_id):
+    cache.delete(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import User
+
+from ..backends import user_key
+
+TEST_NAME = 'test_name'
+PASSWORD = 'Old-pa55word'
+NEW_PASSWORD = 'New-pa55word'
+PROFILE = reverse('posts:profile', args=[TEST_NAME])
+PASSWORD_CHANGE = reverse('users:password_change_form')
+LOGOUT = reverse('users:logout')
+
+
+class CachedAuthTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username=TEST_NAME, password=PASSWORD
+        )
+        self.author = Client()
+        self.author.login(username=TEST_NAME, password=PASSWORD)
+
+    def test_reads_without_auth_queries(self):
+        """Повторное чтение страницы не читает сессию и пользователя
+        из базы."""
+        self.author.get(PROFILE)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.author.get(PROFILE)
+        self.assertTrue(response.context['user'].is_authenticated)
+        self.assertFalse(any(
+            'django_session' in query['sql']
+            or 'WHERE "auth_user"."id" =' in query['sql']
+            for query in queries
+        ))
+
+    def test_password_change_and_logout_forget_user(self):
+        """Смена пароля сбрасывает пользователя в кэше: автор остается
+        в системе, другие его сессии завершаются. Выход тоже сбрасывает
+        кэш."""
+        other = Client()
+        other.login(username=TEST_NAME, password=PASSWORD)
+        other.get(PROFILE)
+        self.assertIsNotNone(cache.get(user_key(self.user.id)))
+        self.author.post(PASSWORD_CHANGE, {
+            'old_password': PASSWORD,
+            'new_password1': NEW_PASSWORD,
+            'new_password2': NEW_PASSWORD,
+        })
+        self.assertIsNone(cache.get(user_key(self.user.id)))
+        self.assertTrue(get_user(self.author).is_authenticated)
+        self.assertFalse(get_user(other).is_authenticated)
+        self.author.get(PROFILE)
+        self.author.get(LOGOUT)
+        self.assertIsNone(cache.get(user_key(self.user.id)))
@@ -30,20 +30,25 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.routers.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.notifications.BadgeMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS += ['debug_toolbar']
+    MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -70,6 +75,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+TEST_RUNNER = 'core.runner.TestRunner'
+
 
 DATABASES = {
     'default': {
@@ -78,6 +85,20 @@ DATABASES = {
     }
 }
 
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Псевдонимы реплик из DATABASES; пустой список — все идет в default.
+REPLICA_DATABASES = []
+REPLICA_PIN_SECONDS = 10
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -94,12 +115,39 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Общий для всех воркеров хоста кэш в файле SQLite (core.cache). Записи
+# хранятся в pickle, поэтому каталог создается с правами 0700 и не должен
+# быть доступен другим пользователям.
+CACHE_DIR = os.environ.get('YATUBE_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_SIZE': 256 * 1024 * 1024,
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # Отдельный файл, чтобы страницы и карточки не вытесняли сессии.
+    # Каталог постоянный: перезагрузка хоста не разлогинивает всех.
+    'sessions': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'sessions.sqlite3'),
+        'OPTIONS': {
+            'MAX_SIZE': 256 * 1024 * 1024,
+            'MAX_ENTRIES': 1000000,
+        },
+    },
 }
 
+# Сессии и пользователь текущего запроса читаются из кэша, без запросов
+# к django_session и auth_user; см. users.backends.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+SESSION_CACHE_ALIAS = 'sessions'
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 5 * 60
+
 LANGUAGE_CODE = 'ru-ru'
 
 TIME_ZONE = 'UTC'
@@ -112,20 +160,84 @@ USE_TZ = True
 
 
 STATIC_URL = '/static/'
-# STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
-STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# Хэшированные имена и сжатые копии: STATIC_ROOT можно отдавать
+# с Cache-Control: public, max-age=31536000, immutable.
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки пишутся на диск кусками и обрываются после UPLOAD_MAX_SIZE.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedUploadHandler']
+UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Адрес сайта для ссылок в письмах дайджеста (переменная окружения
+# YATUBE_SITE_URL, без нее рассылка вне DEBUG не запустится) и число
+# постов в письме.
+SITE_URL = os.environ.get(
+    'YATUBE_SITE_URL', 'http://127.0.0.1:8000' if DEBUG else ''
+).rstrip('/')
+DIGEST_POSTS = 20
+
+METRICS_FILE = os.path.join(CACHE_DIR, 'metrics')
+METRICS_SLOTS = 128
+
 POSTS_PER_PAGE = 10
 
+COMMENTS_PER_PAGE = 20
+
+FEED_ITEMS = 20
+
+INDEX_CACHE_TIMEOUT = 60 * 60
+GROUP_DIRECTORY_TIMEOUT = 60 * 60
+
+# Вкладка «Популярное»: вес комментария удваивается каждые
+# TRENDING_HALF_LIFE секунд, в кэше лежат TRENDING_SIZE лучших постов.
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_SIZE = 20
+TRENDING_TIMEOUT = 60 * 60
+
+# Варианты картинки поста: ширины при пропорции POST_IMAGE_SIZE и форматы
+# по убыванию предпочтения; последний формат — запасной для <img>.
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+THUMBNAIL_WORKERS = 2
+# Сколько секунд не повторять нарезку картинки, которая не удалась.
+THUMBNAIL_FAILURE_TIMEOUT = 10 * 60
+
+# Рассылка уведомлений и раскладка лент подписок: фоновые потоки (0 —
+# сразу после фиксации поста), предел счетчика на значке непрочитанных
+# и срок его жизни в кэше.
+NOTIFICATION_WORKERS = 1
+NOTIFICATION_BADGE_LIMIT = 99
+NOTIFICATION_COUNTER_TIMEOUT = 60 * 60
+
+# Лимиты записывающих страниц: (запросов, за секунд) на пользователя
+# и на IP-адрес; см. core.ratelimit.
+RATE_LIMITS = {
+    'post_create': {'user': (10, 60), 'ip': (30, 60)},
+    'add_comment': {'user': (20, 60), 'ip': (60, 60)},
+    'profile_follow': {'user': (30, 60), 'ip': (60, 60)},
+    'signup': {'ip': (5, 60 * 60)},
+}
+RATE_LIMIT_IP_HEADER = 'REMOTE_ADDR'
+
+POST_CARD_VERSION = 3
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'